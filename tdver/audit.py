@@ -0,0 +1,154 @@
+"""Replay a commit range once, oldest first, judging every tdver release against the one before it"""
+import pygit2
+from . import profile
+from .classify import ChangeSummary, RootTrie, classify_trees
+from .nearest import NearestTag, nearest_tag
+from .results import AuditResult, HistoryIncomplete, TDVerError
+
+
+def resolve(repo, rev):
+    try:
+        return repo.revparse_single(rev).peel(pygit2.Commit).id
+    except (KeyError, ValueError, pygit2.GitError) as e:
+        raise TDVerError("TDVer couldn't resolve %r to a commit." % rev) from e
+
+
+def walk_range(repo, spec="HEAD"):
+    """
+    Yield the commits in spec ("REV" or "OLD..NEW", like git log), every
+    parent before its children.
+    """
+    old, sep, new = spec.partition("..")
+    if not sep:
+        old, new = "", old
+    walker = repo.walk(
+        resolve(repo, new or "HEAD"),
+        pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE,
+    )
+    if old:
+        walker.hide(resolve(repo, old))
+    for commit in walker:
+        profile.count("commits")
+        yield commit
+
+
+def better(found, best):
+    """nearest_tag's ordering: highest version, then fewest commits away."""
+    return best is None or (found.version, -found.distance) > (
+        best.version,
+        -best.distance,
+    )
+
+
+def releases(repo, commits, tagged, limit=None, graph=None):
+    """
+    Yield (commit, release, previous) for each tagged commit, where
+    previous is the NearestTag find_version() would have reported from
+    the commit's parents (None for the first release).
+
+    Each commit's nearest tag is derived from its parents' as the walk
+    passes, so the whole range costs one visit per commit. Parents outside
+    the range (the OLD side of OLD..NEW, or a shallow boundary) are looked
+    up with a bounded nearest_tag() walk instead, once each.
+    """
+    reach = {}  # hex OID -> NearestTag nearest_tag() would return from it
+    for commit in commits:
+        oid = str(commit.id)
+        previous = None
+        for parent in commit.parent_ids:
+            parent = str(parent)
+            if parent not in reach:
+                profile.count("outside_range")
+                reach[parent] = nearest_tag(repo, parent, tagged, limit, graph)
+            found = reach[parent]
+            if found is not None:
+                found = found._replace(distance=found.distance + 1)
+                if better(found, previous):
+                    previous = found
+        if oid in tagged:
+            version, name, tag = max(tagged[oid])
+            release = NearestTag(version, name, tag, oid, 0)
+            reach[oid] = release
+            yield commit, release, previous
+        else:
+            reach[oid] = previous
+
+
+def required_part(summary, changed):
+    """
+    TDVer.needs_increment()'s rules, for a committed range. Files a partial
+    clone couldn't count (summary.missing) only matter if they could still
+    change the answer; then there's no verdict without them.
+    """
+    tests, bugs = summary["tests"], summary["bug_tests"]
+    if tests[1] > 0:  # test lines changed or removed
+        return 0
+    unread(summary, "tests")
+    if tests[0] > 0:  # tests added
+        return 1
+    unread(summary, "bug_tests")
+    if bugs[0] > 0:  # bug tests added
+        return 2
+    if changed:
+        return 3
+    return None
+
+
+def unread(summary, name):
+    paths = summary.missing.get(name)
+    if not paths:
+        return
+    shown = ", ".join(paths[:3]) + (", ..." if len(paths) > 3 else "")
+    raise HistoryIncomplete(
+        "%d changed file(s) in the %s root weren't fetched into this partial clone (%s)"
+        % (len(paths), name, shown),
+        "any git command that reads them fetches them (e.g. `git log -p -- <path>`),"
+        " or clone without --filter",
+    )
+
+
+def audit_releases(  # pylint: disable=too-many-arguments
+    repo, spec, tagged, roots, limit=None, graph=None, partial=False, budget=None
+):
+    """
+    Yield an AuditResult for every tagged commit in spec, oldest first.
+
+    Each release is classified against the tree of the release before it,
+    exactly as `tdver check` would have seen it just before tagging; the
+    subtree OID short-circuit in classify_trees() keeps that to the test
+    roots that actually changed between the two.
+    """
+    trie = RootTrie(roots)
+    with profile.phase("audit"):
+        for commit, release, previous in releases(
+            repo, walk_range(repo, spec), tagged, limit, graph
+        ):
+            if previous is None:
+                yield AuditResult(release)
+                continue
+            try:
+                old_tree, new_tree = repo[previous.commit].tree, commit.tree
+            except pygit2.GitError as e:
+                if not partial:
+                    raise
+                raise HistoryIncomplete(
+                    "the trees of %s and %s aren't both in this partial clone"
+                    % (previous.name, release.name),
+                    "clone with --filter=blob:none instead of tree:0",
+                ) from e
+            summary = classify_trees(
+                repo,
+                old_tree,
+                new_tree,
+                trie,
+                ChangeSummary(roots),
+                partial,
+                budget,
+            )
+            part = required_part(summary, old_tree.id != new_tree.id)
+            required = (
+                previous.version.increment(part)
+                if part is not None
+                else previous.version
+            )
+            yield AuditResult(release, previous, part, required, summary)
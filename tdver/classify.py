@@ -0,0 +1,324 @@
+"""Sort the deltas of a diff into the test roots configured in tdver.json"""
+from fnmatch import fnmatchcase
+import pygit2
+from . import profile
+from .results import HistoryIncomplete, TDVerError
+
+GLOB_CHARS = "*?["
+
+
+def as_patterns(value):
+    """Config roots may be a single prefix/glob or a list of them."""
+    if isinstance(value, str):
+        return [value]
+    return list(value or ())
+
+
+class RootTrie(object):
+    """
+    Character trie over the literal prefix of every root pattern.
+
+    Plain patterns ("tests/") match any path that starts with them, just like
+    the old str.startswith check. Globs ("pkgs/*/tests/**") are filed under
+    their literal lead-in ("pkgs/") and only fnmatch'd against paths that
+    make it that far down the trie.
+    """
+
+    __slots__ = ("root", "dirs")
+
+    def __init__(self, roots=None):
+        self.root = {}
+        self.dirs = set()  # directory each pattern's literal lead-in lives under
+        for name, patterns in (roots or {}).items():
+            for pattern in as_patterns(patterns):
+                self.add(name, pattern)
+
+    def add(self, name, pattern):
+        cut = min(
+            [pattern.index(c) for c in GLOB_CHARS if c in pattern] or [len(pattern)]
+        )
+        glob = None
+        if cut < len(pattern):
+            glob = pattern + "*" if pattern.endswith("/") else pattern
+        node = self.root
+        for char in pattern[:cut]:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append((name, glob))
+        self.dirs.add(pattern[:cut].rpartition("/")[0])
+
+    def subtrees(self):
+        """
+        The outermost directories that hold every root, or None if some
+        pattern can match at the top level (e.g. "tests" also matches
+        "tests.py") so only a full-tree walk is safe.
+        """
+        if "" in self.dirs:
+            return None
+        outer = []
+        for path in sorted(self.dirs):
+            if not any(path.startswith(top + "/") for top in outer):
+                outer.append(path)
+        return outer
+
+    def match(self, path):
+        """Return the set of root names a path falls under."""
+        found = set()
+        node = self.root
+        for char in path:
+            self._collect(node, path, found)
+            node = node.get(char)
+            if node is None:
+                return found
+        self._collect(node, path, found)
+        return found
+
+    @staticmethod
+    def _collect(node, path, found):
+        for name, glob in node.get(None, ()):
+            if glob is None or fnmatchcase(path, glob):
+                found.add(name)
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+class ChangeSummary(object):
+    """
+    Per-root (insertions, deletions) plus the total number of files changed.
+    missing maps a root to the paths whose lines couldn't be counted because
+    a partial clone hasn't fetched their blobs (see classify()).
+    """
+
+    __slots__ = ("roots", "files_changed", "missing")
+
+    def __init__(self, names=()):
+        self.roots = {name: [0, 0] for name in names}
+        self.files_changed = 0
+        self.missing = {}
+
+    def __getitem__(self, name):
+        return tuple(self.roots.get(name, (0, 0)))
+
+    def count(self, name, insertions, deletions):
+        counts = self.roots.setdefault(name, [0, 0])
+        counts[0] += insertions
+        counts[1] += deletions
+
+    def __repr__(self):
+        return "ChangeSummary(roots=%r, files_changed=%d)" % (
+            {k: tuple(v) for k, v in self.roots.items()},
+            self.files_changed,
+        )
+
+
+class DiffBudget(object):
+    """
+    How much of a changed file is read to count its lines (tdver.json):
+
+    diff_size_limit: bytes (0 for no limit). When either side's blob is
+    bigger, the file is counted from its delta status alone (by_status())
+    without loading it.
+
+    binary_files: "skip" counts a binary file as no lines changed; "status"
+    counts it by status, like an oversized file.
+    """
+
+    __slots__ = ("size_limit", "binary")
+
+    SIZE_LIMIT = 8 << 20  # bytes
+    BINARY = ("skip", "status")
+
+    def __init__(self, size_limit=SIZE_LIMIT, binary="skip"):
+        if (
+            not isinstance(size_limit, int)
+            or isinstance(size_limit, bool)
+            or size_limit < 0
+        ):
+            raise TDVerError(
+                "diff_size_limit must be a number of bytes (0 for no limit), not %r"
+                % (size_limit,)
+            )
+        if binary not in self.BINARY:
+            raise TDVerError(
+                "binary_files must be one of %s, not %r"
+                % ("/".join(self.BINARY), binary)
+            )
+        self.size_limit = size_limit
+        self.binary = binary
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get("diff_size_limit", cls.SIZE_LIMIT),
+            config.get("binary_files", "skip"),
+        )
+
+    def key(self):
+        """What results depend on, for ResultCache.key()."""
+        return [self.size_limit, self.binary]
+
+
+def by_status(delta):
+    """A file's count when its lines aren't read: one per side that exists."""
+    if delta.old_file.id == delta.new_file.id:
+        return 0, 0  # only the mode changed
+    return int(any(delta.new_file.id.raw)), int(any(delta.old_file.id.raw))
+
+
+class LineCounter(object):
+    """
+    (insertions, deletions) for one delta at a time, within a DiffBudget.
+
+    Each patch is dropped as soon as it's counted, so memory is bounded by
+    the largest pair of blobs under the size limit, not by the diff. Blob
+    sizes come from object headers, so oversized blobs are never loaded.
+    Without an odb nothing is checked up front and every file is read.
+    """
+
+    __slots__ = ("odb", "partial", "budget")
+
+    def __init__(self, odb=None, partial=False, budget=None):
+        self.odb = odb
+        self.partial = partial
+        self.budget = budget or DiffBudget()
+
+    def size(self, side):
+        if not any(side.id.raw) or side.mode == pygit2.GIT_FILEMODE_COMMIT:
+            return 0
+        return self.odb.read_header(side.id)[1]
+
+    def __call__(self, diff, index, delta):
+        """Line stats for diff[index], or None if a partial clone lacks a blob."""
+        if self.partial and not readable(delta, self.odb):
+            return None
+        if self.odb is not None and self.budget.size_limit:
+            size = max(self.size(delta.old_file), self.size(delta.new_file))
+            if size > self.budget.size_limit:
+                profile.count("by_status")
+                return by_status(delta)
+        patch = diff[index]
+        loaded = patch.delta.old_file.size + patch.delta.new_file.size
+        profile.count("blob_bytes", loaded)
+        profile.peak("peak_blob_bytes", loaded)
+        if patch.delta.is_binary:
+            profile.count("binary")
+            return by_status(delta) if self.budget.binary == "status" else (0, 0)
+        profile.count("patches")
+        _, insertions, deletions = patch.line_stats
+        return insertions, deletions
+
+
+def classify(diff, roots, summary=None, prefix="", counter=None):
+    """
+    Walk a pygit2.Diff once, counting every delta toward files_changed and
+    the line stats of each delta toward every root it matches. Patches are
+    only generated for deltas that land in at least one root, one at a
+    time (see LineCounter).
+
+    A diff between two subtrees has paths relative to them; pass the
+    subtree's path as prefix so they're matched against the full path.
+
+    A delta the counter can't read (a partial clone hasn't fetched its
+    blobs; pygit2 never fetches on demand) is recorded in summary.missing
+    instead of being counted.
+    """
+    trie = roots if isinstance(roots, RootTrie) else RootTrie(roots)
+    if summary is None:
+        summary = ChangeSummary(roots if isinstance(roots, dict) else ())
+    if counter is None:
+        counter = LineCounter()
+    for index, delta in enumerate(diff.deltas):
+        summary.files_changed += 1
+        profile.count("deltas")
+        names = trie.match(prefix + delta.new_file.path)
+        if delta.old_file.path != delta.new_file.path:
+            names |= trie.match(prefix + delta.old_file.path)
+        if not names:
+            continue
+        counted = counter(diff, index, delta)
+        if counted is None:
+            profile.count("unread")
+            path = prefix + delta.new_file.path
+            for name in names:
+                summary.missing.setdefault(name, []).append(path)
+            continue
+        insertions, deletions = counted
+        for name in names:
+            summary.count(name, insertions, deletions)
+    return summary
+
+
+def readable(delta, odb):
+    """Are both sides' blobs (where they exist) in odb?"""
+    for side in (delta.old_file, delta.new_file):
+        if not any(side.id.raw) or side.mode == pygit2.GIT_FILEMODE_COMMIT:
+            continue  # added/deleted, or a submodule: nothing to read
+        if side.id not in odb:
+            return False
+    return True
+
+
+def subtree(tree, path):
+    """Return the tree at path, or None if it's missing or not a directory."""
+    try:
+        entry = tree[path]
+    except KeyError:
+        return None
+    return entry if entry.type_str == "tree" else None
+
+
+def subtree_diff(old, new):
+    """Diff two (possibly missing) subtrees; None if there's nothing to diff."""
+    if old is None and new is None:
+        return None
+    # line stats don't need context, so don't make libgit2 build any
+    if old is None:
+        return new.diff_to_tree(context_lines=0, swap=True)
+    if new is None:
+        return old.diff_to_tree(context_lines=0)
+    if old.id == new.id:
+        return None
+    return old.diff_to_tree(new, context_lines=0)
+
+
+def classify_trees(  # pylint: disable=too-many-arguments
+    repo, old_tree, new_tree, roots, summary=None, partial=False, budget=None
+):
+    """
+    Classify the changes between two trees without a whole-tree diff.
+
+    Each directory holding a root is looked up by OID in both trees first;
+    identical OIDs mean nothing underneath changed, so only the subtrees
+    that actually differ get diffed. files_changed then only counts deltas
+    under those directories. Falls back to classify() over the full diff
+    when a root can't be pinned to a directory.
+
+    budget (a DiffBudget) bounds how much of each file is read. With
+    partial (a clone with a --filter), only blobs that are present get
+    counted (see classify()), and a tree that was filtered out raises
+    HistoryIncomplete instead of a GitError.
+    """
+    trie = roots if isinstance(roots, RootTrie) else RootTrie(roots)
+    if summary is None:
+        summary = ChangeSummary(roots if isinstance(roots, dict) else ())
+    if old_tree.id == new_tree.id:
+        return summary
+    counter = LineCounter(repo.odb, partial, budget)
+    try:
+        dirs = trie.subtrees()
+        if dirs is None:
+            diff = repo.diff(old_tree, new_tree, context_lines=0)
+            return classify(diff, trie, summary, "", counter)
+        for path in dirs:
+            profile.count("subtrees")
+            diff = subtree_diff(subtree(old_tree, path), subtree(new_tree, path))
+            if diff is not None:
+                classify(diff, trie, summary, path + "/", counter)
+    except pygit2.GitError as e:
+        if not partial:
+            raise
+        raise HistoryIncomplete(
+            "a tree under the test roots isn't in this partial clone (%s)" % e,
+            "fetch it, or clone with --filter=blob:none instead of tree:0",
+        ) from e
+    return summary
@@ -0,0 +1,380 @@
+"""The tdver command line: a thin layer over TDVer's structured results"""
+import os
+import sys
+import json
+import argparse
+from . import __doc__ as description, meta, profile, serve as daemon
+from .fleet import TIMEOUT as FLEET_TIMEOUT
+from .results import TDVerError
+
+
+def env_flag(name):
+    """An on/off environment variable; unset, "", 0, false, no and off are off."""
+    value = os.environ.get(name, "").strip().lower()
+    return value not in ("", "0", "false", "no", "off")
+
+
+def check(tdver, args):
+    if args.all:
+        return check_all(tdver)
+    if args.refs:
+        return check_refs(tdver, args)
+    result = tdver.check()
+    if not result.ok:
+        return result.message
+    # Print verstring to stdout for piping; effectively:
+    # By our rules this version is valid, but you can pipe to another cli/validator
+    # which may object for other reasons; i.e.:
+    #   because not all verstring locations match
+    #   version-sensitive tests didn't pass
+    print(result.message)
+    return 0  # current version valid
+
+
+def check_all(tdver):
+    from .workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+    failed = False
+    for path, result in Workspace(tdver.repo).check():
+        name = path or "."
+        if isinstance(result, TDVerError):
+            print("%s: %s" % (name, result), file=sys.stderr)
+            failed = True
+        elif result.ok:
+            print("%s: %s" % (name, result.message))
+        else:
+            print("%s:\n%s" % (name, result.message), file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+def check_refs(tdver, args):
+    from .refs import RefChecker  # pylint: disable=import-outside-toplevel
+
+    # one JSON verdict per ref, in ref order, flushed as each is judged
+    failed = 0
+    for name, commit, result in RefChecker(tdver, args.jobs).check(args.refs):
+        if isinstance(result, TDVerError):
+            verdict = {"ok": False, "error": str(result)}
+        else:
+            verdict = result.as_dict()
+        verdict.update(ref=name, commit=commit)
+        print(json.dumps(verdict, sort_keys=True), flush=True)
+        failed += not verdict["ok"]
+    return 1 if failed else 0
+
+
+def release(tdver, args):
+    result = tdver.release(write_worktree=args.worktree)
+    if not result.ok:
+        return result.message
+    print(result.message)
+    return 0
+
+
+def support(tdver, args):
+    if args.plan:
+        result = tdver.plan_support()
+    elif args.all:
+        result = tdver.support_all()
+    else:
+        result = tdver.support()
+    if not result.ok:
+        return result.message
+    print(result.message)
+    return 0
+
+
+def audit(tdver, args):
+    # one JSON verdict per line, flushed as each release is judged
+    failed = 0
+    for result in tdver.audit(args.range):
+        print(json.dumps(result.as_dict(), sort_keys=True), flush=True)
+        failed += not result.ok
+    return 1 if failed else 0
+
+
+def fleet(tdver, args):  # pylint: disable=unused-argument
+    # pylint: disable=import-outside-toplevel
+    from .fleet import Summary, read_paths, sweep
+
+    if args.repos == "-":
+        paths = list(read_paths(sys.stdin))
+    else:
+        try:
+            with open(args.repos, "r") as f:
+                paths = list(read_paths(f))
+        except OSError as e:
+            return "tdver couldn't read the repository list: %s" % e
+    summary = Summary()
+    for result in sweep(paths, args.jobs, args.timeout or None, args.all):
+        summary.add(result)
+        print(json.dumps(result, sort_keys=True), flush=True)
+    print(json.dumps({"summary": summary.as_dict()}, sort_keys=True), flush=True)
+    return 0 if summary.ok == summary.total else 1
+
+
+def serve(tdver, args):
+    if args.stop:
+        if daemon.request(os.getcwd(), "stop") is None:
+            return "tdver isn't serving this repository."
+        return 0
+    # pylint: disable=import-outside-toplevel
+    from .server import Server
+    from .session import Session
+
+    try:
+        server = Server(Session(tdver.repo.workdir or tdver.repo.path))
+    except OSError as e:
+        return "tdver couldn't serve this repository: %s" % e
+    print("tdver serving on %s" % server.server_address, file=sys.stderr)
+    server.run()
+    return 0
+
+
+def forwarded(reply):
+    """Report a daemon's reply exactly as the in-process handler would."""
+    if "error" in reply:
+        return reply["error"]
+    if not reply["ok"]:
+        return reply["message"]
+    print(reply["message"])
+    return 0
+
+
+# handlers a running `tdver serve` can answer instead
+FORWARD = (check, support)
+
+
+def start(tdver, args):  # pylint: disable=unused-argument
+    print(tdver.start())
+    return 0
+
+
+def build_parser(config, configured=True):
+    """
+    Build the CLI without touching the repository; everything a
+    subcommand needs from git is computed lazily when it asks for it.
+    Without a tdver.json on disk (configured=False), start is offered
+    too; whether one is committed at HEAD (bare and sparse clones) is
+    only looked up once another subcommand is chosen (see main).
+    """
+    parser = argparse.ArgumentParser(
+        description=description,
+        prog="tdver",
+        conflict_handler="resolve",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(
+        description=None, title=None, help=None, metavar="actions:"
+    )
+    parser.add_argument(
+        "--version", action="version", version="%(prog)s " + config["version"]
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=env_flag(profile.ENV),
+        help="report per-phase time, counters and peak memory to stderr (env: %s)"
+        % profile.ENV,
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=profile.FORMATS,
+        default=os.environ.get(profile.ENV_FORMAT) or "table",
+        help="a summary table or Chrome trace-event JSON (env: %s)"
+        % profile.ENV_FORMAT,
+    )
+    parser.add_argument(
+        "--profile-pymem",
+        action="store_true",
+        default=env_flag(profile.ENV_PYMEM),
+        help="also trace Python heap peaks with tracemalloc; slow (env: %s)"
+        % profile.ENV_PYMEM,
+    )
+    parser.add_argument(
+        "--profile-out",
+        metavar="PATH",
+        default=os.environ.get(profile.ENV_OUT) or None,
+        help="write the profile report to PATH instead (env: %s)" % profile.ENV_OUT,
+    )
+
+    # fleet works on other repositories, so it's available from anywhere
+    fleet_desc = "check many repositories in parallel, one JSON verdict per line"
+    fleet_cmd = subparsers.add_parser("fleet", help=fleet_desc, description=fleet_desc)
+    fleet_cmd.add_argument(
+        "repos",
+        nargs="?",
+        default="-",
+        help="file listing one repository path per line (default: stdin)",
+    )
+    fleet_cmd.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="repositories to check at once (default: one per CPU)",
+    )
+    fleet_cmd.add_argument(
+        "--timeout",
+        type=float,
+        default=FLEET_TIMEOUT,
+        help="seconds before giving up on a repository; 0 waits forever (default: %(default)s)",
+    )
+    fleet_cmd.add_argument(
+        "--all",
+        action="store_true",
+        help="check every tdver.json package in each repository",
+    )
+    fleet_cmd.set_defaults(func=fleet)
+
+    # two basic cases: 1.) we are a tdver repo already;
+    # 2.) there's no tdver.json here, so 'start' may be the only viable
+    # command; the rest then need one committed at HEAD
+    if not configured:
+        start_cmd = subparsers.add_parser(
+            "start",
+            help="Initialize a new tdver repository and commit the metadata files",
+            conflict_handler="resolve",
+        )
+        start_cmd.set_defaults(func=start)
+
+    check_desc = "determine if the repository is in a releasable state"
+    check_cmd = subparsers.add_parser("check", help=check_desc, description=check_desc)
+    check_scope = check_cmd.add_mutually_exclusive_group()
+    check_scope.add_argument(
+        "--all",
+        action="store_true",
+        help="check every package (directory with a tdver.json) in the repository",
+    )
+    check_scope.add_argument(
+        "--refs",
+        action="append",
+        metavar="PATTERN",
+        help="check every ref matching PATTERN (a glob like refs/heads/*, or a"
+        " prefix like refs/remotes/origin) instead of HEAD, one JSON line each;"
+        " repeatable",
+    )
+    check_cmd.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="with --refs, refs to diff at once (default: one per CPU)",
+    )
+    release_desc = "increment, commit and tag a new release"
+    release_cmd = subparsers.add_parser(
+        "release", help=release_desc, description=release_desc
+    )
+    release_cmd.add_argument(
+        "--no-worktree",
+        dest="worktree",
+        action="store_false",
+        help="only update refs; leave tdver.json on disk and in the index alone",
+    )
+    support_desc = "create a new version-maintenance branch"
+    support_cmd = subparsers.add_parser(
+        "support", help=support_desc, description=support_desc
+    )
+    support_mode = support_cmd.add_mutually_exclusive_group()
+    support_mode.add_argument(
+        "--all",
+        action="store_true",
+        help="create every missing maintenance branch the release history calls for",
+    )
+    support_mode.add_argument(
+        "--plan",
+        action="store_true",
+        help="list every maintainable A.x/A.B.x line and whether its branch exists",
+    )
+    audit_desc = "judge every release in a commit range against the one before it"
+    audit_cmd = subparsers.add_parser("audit", help=audit_desc, description=audit_desc)
+    audit_cmd.add_argument(
+        "range",
+        nargs="?",
+        default="HEAD",
+        help="REV or OLD..NEW, as for git log (default: HEAD)",
+    )
+    serve_desc = "keep this repository warm and answer check/support over a unix socket"
+    serve_cmd = subparsers.add_parser("serve", help=serve_desc, description=serve_desc)
+    serve_cmd.add_argument(
+        "--stop", action="store_true", help="stop the daemon serving this repository"
+    )
+
+    # branch_arg = (("-b", "--branch"), {"help": "not yet implemented"})
+
+    # check_cmd.add_argument(*branch_arg[0], **branch_arg[1])
+    check_cmd.set_defaults(func=check)
+    # release_cmd.add_argument(*branch_arg[0], **branch_arg[1])
+    release_cmd.set_defaults(func=release)
+    # support_cmd.add_argument(*branch_arg[0], **branch_arg[1])
+    support_cmd.set_defaults(func=support)
+    audit_cmd.set_defaults(func=audit)
+    serve_cmd.set_defaults(func=serve)
+
+    return parser
+
+
+def run(config, args):
+    if "func" not in args:
+        return 0
+    if (
+        args.func in FORWARD
+        and not getattr(args, "all", False)
+        and not getattr(args, "plan", False)
+        and not getattr(args, "refs", None)
+        and not env_flag(daemon.ENV_OFF)
+    ):
+        reply = daemon.request(os.getcwd(), args.func.__name__)
+        if reply is not None:
+            return forwarded(reply)
+    from .core import TDVer  # pylint: disable=import-outside-toplevel
+
+    try:
+        return args.func(TDVer(config), args)
+    except TDVerError as e:
+        return str(e)
+
+
+def committed_config():
+    """The current package's tdver.json as committed at HEAD, or None."""
+    from .core import TDVer  # pylint: disable=import-outside-toplevel
+
+    tdver = TDVer()
+    try:
+        repo = tdver.repo
+    except TDVerError:  # not in a repository
+        return None
+    return repo.committed_config(tdver.path)
+
+
+def main(argv=None):
+    found = meta.load()
+    config = dict(meta.DEFAULTS, **(found or {}))
+    args = build_parser(config, found is not None).parse_args(argv)
+    func = getattr(args, "func", None)  # none without a subcommand
+    # only now, and only for subcommands that need it, open the repository
+    # for a committed tdver.json; --help and --version never do
+    if func not in (None, start, fleet) and (
+        found is None or not getattr(args, "worktree", True)
+    ):
+        try:
+            committed = committed_config()
+        except TDVerError as e:
+            sys.exit(str(e))
+        if committed is None and found is None:
+            sys.exit(
+                "TDVer found no tdver.json here or at HEAD; `tdver start` creates one."
+            )
+        # release --no-worktree releases what's committed, not what's on disk
+        config = dict(meta.DEFAULTS, **(committed or found))
+    if args.profile or args.profile_out:
+        profiler = profile.enable(args.profile_pymem)
+        try:
+            with profiler.phase(func.__name__ if func else "tdver"):
+                status = run(config, args)
+        finally:
+            profiler.report(args.profile_format, args.profile_out)
+    else:
+        status = run(config, args)
+    sys.exit(status)
@@ -0,0 +1,784 @@
+"""The repository and the TDVer rules evaluated against it"""
+import os
+import re
+import json
+import pygit2
+from contextlib import contextmanager
+from functools import cached_property
+from . import meta, odb, profile, worktree
+from .audit import audit_releases, required_part
+from .classify import DiffBudget, RootTrie, as_patterns, classify_trees, subtree
+from .memo import ResultCache
+from .nearest import CommitGraph, WalkLimitExceeded, nearest_tag
+from .results import (
+    CheckResult,
+    HistoryIncomplete,
+    ReleaseResult,
+    SupportPlan,
+    SupportResult,
+    TDVerError,
+)
+from .tags import TagCache, common_dir
+from .versions import Version, VersionIndex
+
+
+class Repo(pygit2.Repository):
+    @classmethod
+    def open(cls, path):
+        """Open the repository containing path."""
+        found = pygit2.discover_repository(path)
+        if found is None:
+            raise TDVerError("TDVer can only run on a git repository. (%s)" % path)
+        try:
+            with profile.phase("open"):
+                return cls(found)
+        except pygit2.GitError as e:
+            raise TDVerError("TDVer can only run on a git repository. %r" % e) from e
+
+    def dirty(self, trie=None):
+        """Does tracked content (optionally only under trie's roots) differ from HEAD?"""
+        with profile.phase("dirty"):
+            return worktree.dirty(self, trie)
+
+    def committed_config(self, path="", commit=None):
+        """
+        The tdver.json of the package at path as committed at commit (a
+        hex OID; default HEAD), or None; for bare and sparse clones, where
+        it isn't on disk, and for refs other than the one checked out.
+        """
+        name = path + "/" + meta.NAME if path else meta.NAME
+        try:
+            tree = (self[commit] if commit else self.head).peel(pygit2.Tree)
+            blob = self[tree[name].id]
+        except (KeyError, pygit2.GitError):  # unborn, not committed, or not fetched
+            return None
+        try:
+            return json.loads(blob.data)
+        except ValueError as e:
+            raise TDVerError(
+                "%s at %s isn't valid JSON: %s" % (name, commit or "HEAD", e)
+            ) from e
+
+    @contextmanager
+    def walking(self, start="HEAD"):
+        """
+        The commit-graph (or None) for a walk back from start to its last
+        release (see nearest), with the walk's failures as TDVerErrors.
+        """
+        try:
+            yield CommitGraph.load(common_dir(self.path))
+        except WalkLimitExceeded as e:
+            raise TDVerError(
+                "TDVer couldn't find a release: %s (see walk_limit)" % e
+            ) from e
+        except pygit2.GitError as e:
+            raise TDVerError("TDVer couldn't read %s. %r" % (start, e)) from e
+
+    def no_release(self, start="HEAD"):
+        """The error for a walk back from start that found no release tag."""
+        if self.is_shallow:
+            # the walk stopped at the shallow boundary, not the root commit
+            return HistoryIncomplete(
+                "no release tag is reachable from %s in this shallow clone" % start,
+                "fetch more history and its tags (e.g. `git fetch --deepen=100"
+                " --tags`, or `git fetch --unshallow --tags`)",
+            )
+        return TDVerError(
+            "TDVer couldn't find a release tag reachable from %s." % start
+        )
+
+    def incomplete(self):
+        """
+        How this clone may be missing objects: "shallow" (clone --depth)
+        and/or "partial" (clone --filter, i.e. a promisor remote). pygit2
+        never fetches what's missing, so these change what TDVer may read.
+        """
+        kinds = []
+        if self.is_shallow:
+            kinds.append("shallow")
+        for entry in self.config:
+            if entry.name == "extensions.partialclone" or (
+                entry.name.startswith("remote.")
+                and entry.name.endswith(".promisor")
+                and worktree.config_bool(self, entry.name, False)
+            ):
+                kinds.append("partial")
+                break
+        return tuple(kinds)
+
+
+class TDVer(
+    object
+):  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    PARTS = ["a", "b", "c", "d"]
+    A = 0  # pylint: disable=invalid-name
+    B = 1  # pylint: disable=invalid-name
+    C = 2  # pylint: disable=invalid-name
+    D = 3  # pylint: disable=invalid-name
+    POSITIONS = [A, B, C, D]
+    INSERTIONS = 0
+    DELETIONS = 1
+
+    version_fmt = re.compile(
+        r"""
+        ([0-9]+)                # match part A
+        \.
+        ([0-9]+)                # match part B
+        \.
+        ([0-9]+)                # match part C
+        (?:-?                   # looking for either a D part or commits since tag
+            (?:
+                (?:\d+-\w{8})   # swallow git describe's commits-since-tag fmt. We have to look for this first to lock up its -#commits indicator and avoid accidentally identifying it as our part D
+                |
+                ([0-9]+)        # match part D
+            )
+        )*                      # check more than once, since both can be present
+    """,
+        re.VERBOSE,
+    )
+
+    # most commits find_version will walk looking for a tag (config: walk_limit)
+    WALK_LIMIT = 100000
+
+    # config keys holding a prefix/glob (or a list of them) for each test root
+    ROOTS = ["tests", "bug_tests"]
+
+    config = meta.DEFAULTS
+
+    def __init__(self, config=None, repo=None, tag_cache=None, path=None):
+        """
+        Evaluate one repository state. Pass repo/tag_cache (see Session) to
+        reuse an open repository and its parsed tags; otherwise the
+        repository containing the current directory is opened on demand.
+
+        path is the package's directory relative to the top of the worktree
+        ("" for the top itself); by default, the current directory's.
+        """
+        self.config = dict(TDVer.config, **(config or {}))
+        if repo is not None:
+            self.repo = repo
+        if tag_cache is not None:
+            self.tag_cache = tag_cache
+        if path is not None:
+            self.path = path
+
+        # TODO: figure out right way to get these
+        self.author = pygit2.Signature("TODO", "todo@example.com")
+        self.committer = pygit2.Signature("TOODLES", "toodles@example.com")
+
+    # Repository state is memoized per-invocation and only computed when a
+    # subcommand actually pulls on it; --help/--version never open the repo,
+    # support only reads tags, and check only diffs as far as it must.
+
+    @cached_property
+    def repo(self):
+        return Repo.open(os.getcwd())  # present dir
+
+    @cached_property
+    def path(self):
+        if self.repo.workdir is None:
+            return ""
+        path = os.path.relpath(os.getcwd(), self.repo.workdir).replace(os.sep, "/")
+        return "" if path == "." else path
+
+    @cached_property
+    def prefix(self):
+        """Our tag namespace: bare versions at the top, "<path>/" for nested packages."""
+        default = self.path + "/" if self.path else ""
+        prefix = self.config.get("tag_prefix", default)
+        if prefix and not prefix.endswith("/"):
+            raise TDVerError(
+                "tag_prefix %r must end with '/' (tags look like <prefix><version>)"
+                % prefix
+            )
+        return prefix
+
+    def scoped(self, patterns):
+        """Config paths are relative to the package's directory."""
+        if not self.path or not patterns:
+            return patterns
+        return [self.path + "/" + pattern for pattern in as_patterns(patterns)]
+
+    @cached_property
+    def versions(self):
+        return self.find_versions()
+
+    @cached_property
+    def nearest(self):
+        return self.find_version()
+
+    @cached_property
+    def last_version(self):
+        return self.nearest.version
+
+    @cached_property
+    def version(self):
+        """The working version; increment_version() replaces it, last_version stays put."""
+        return self.last_version
+
+    @cached_property
+    def last_tag(self):
+        return self.nearest.name
+
+    @cached_property
+    def walk_limit(self):
+        return self.config.get("walk_limit", self.WALK_LIMIT)
+
+    @cached_property
+    def roots(self):
+        return {name: self.scoped(self.config.get(name)) for name in self.ROOTS}
+
+    @cached_property
+    def root_trie(self):
+        return RootTrie(self.roots)
+
+    @cached_property
+    def diff_budget(self):
+        return DiffBudget.from_config(self.config)
+
+    @cached_property
+    def dirty_trie(self):
+        """
+        Optional "dirty_paths" prefixes/globs that limit the dirty check;
+        nested packages only look at their own directory by default.
+        """
+        paths = self.config.get("dirty_paths")
+        if paths:
+            paths = self.scoped(paths)
+        elif self.path:
+            paths = self.path + "/"
+        return RootTrie({"dirty_paths": paths}) if paths else None
+
+    @cached_property
+    def dirty(self):
+        return self.repo.dirty(self.dirty_trie)
+
+    @cached_property
+    def incomplete(self):
+        return self.repo.incomplete()
+
+    @cached_property
+    def tag_tree(self):
+        # diff straight against the object the walk found; no name lookup
+        try:
+            return self.repo[self.nearest.tag].peel(pygit2.Tree)
+        except pygit2.GitError as e:
+            if "partial" not in self.incomplete:
+                raise
+            raise HistoryIncomplete(
+                "the tree of %s isn't in this partial clone" % self.last_tag,
+                "clone with --filter=blob:none instead of tree:0",
+            ) from e
+
+    @cached_property
+    def head(self):
+        """The commit being judged: HEAD, unless check_refs() seeds another."""
+        return self.repo.head.target
+
+    @cached_property
+    def head_tree(self):
+        return self.repo[self.head].peel(pygit2.Tree)
+
+    @cached_property
+    def committed(self):
+        """
+        (ChangeSummary, required part) for last_tag..HEAD, ignoring the
+        worktree. Both only depend on the two commits and the roots, so
+        they're remembered across runs in the result cache.
+        """
+        key = ResultCache.key(
+            self.nearest.commit, self.head, self.roots, self.diff_budget
+        )
+        found = self.result_cache.get(key)
+        if found is None:
+            summary = self.find_changes()
+            found = (summary, required_part(summary, self.tree_changed()))
+            if not summary.missing:  # counts would be short once they're fetched
+                self.result_cache.put(key, *found)
+        return found
+
+    def tree_changed(self):
+        """Did any commit since last_tag touch the package's directory?"""
+        if not self.path:
+            return self.tag_tree.id != self.head_tree.id
+        old = subtree(self.tag_tree, self.path)
+        new = subtree(self.head_tree, self.path)
+        return (old and old.id) != (new and new.id)
+
+    @cached_property
+    def result_cache(self):
+        return ResultCache(
+            self.repo, self.config.get("result_cache_size", ResultCache.SIZE)
+        )
+
+    @cached_property
+    def summary(self):
+        """Every root's line stats and files_changed, from one walk of the diff."""
+        return self.committed[0]
+
+    @cached_property
+    def changes(self):
+        return self.summary["tests"]
+
+    @cached_property
+    def bug_changes(self):
+        return self.summary["bug_tests"]
+
+    def find_changes(self):
+        """Classify last_tag..HEAD into the configured roots in a single pass."""
+        with profile.phase("diff"):
+            return classify_trees(
+                self.repo,
+                self.tag_tree,
+                self.head_tree,
+                self.root_trie,
+                partial="partial" in self.incomplete,
+                budget=self.diff_budget,
+            )
+
+    @classmethod
+    def valid_tag(cls, tag):
+        """Return a match object if it looks like a tdver tag, else None"""
+        return cls.version_fmt.match(tag)
+
+    @classmethod
+    def parse_tag(cls, tag):
+        test = cls.valid_tag(tag)
+        return Version(*(int(part) for part in test.groups(0))) if test else None
+
+    def find_version(self):
+        """
+        Return a NearestTag for the highest tdver tag reachable from HEAD,
+        with its distance and tag OID. Annotated and lightweight tags both
+        count; the walk uses the commit-graph file when there is one.
+        """
+        with self.repo.walking() as graph:
+            found = nearest_tag(
+                self.repo,
+                str(self.head),
+                self.tag_cache.tagged(self.prefix),
+                limit=self.walk_limit,
+                graph=graph,
+            )
+        if found is None:
+            raise self.repo.no_release()
+        return found
+
+    def find_versions(self):
+        """Return a VersionIndex of our version numbers"""
+        return VersionIndex(self.tag_cache.versions(self.prefix), presorted=True)
+
+    @cached_property
+    def tag_cache(self):
+        return TagCache(self.repo, self.parse_tag)
+
+    def find_max_version(self):
+        return self.versions.latest()
+
+    def increment(self, pos, version=None):
+        """Return version (default: self.version) with part pos incremented."""
+        if version is None:
+            version = self.version
+        return Version(*version).increment(pos)
+
+    def incrementable(self, pos, start_version=None):
+        """using our current version as the starting point, can a given position increment?
+        #we have a current version like 1.2.3.4
+            #4 can increment if there is no 1.2.3.5, though it may be ill-advised to let it increment if 1.2.4 exists.
+            #3 can increment if there is no 1.2.4.0
+            #2 can increment if there is no 1.3.0.0
+            #1 can increment if there is no 2.0.0.0
+            #
+        """
+        return self.blocker(pos, start_version) is None
+
+    def blocker(self, pos, start_version=None):
+        """The release that keeps part pos from incrementing, or None if it can."""
+        if start_version is None:
+            start_version = self.version
+
+        # top version; the world is our oyster
+        if self.versions.successor(start_version) is None:
+            return None
+
+        # no sense allowing a "dev" version when a newer bugfix version exists
+        # because no more releases are possible anyways
+        if pos == self.D and self.versions.next_exists(start_version, self.C):
+            pos = self.C
+
+        if not self.versions.next_exists(start_version, pos):
+            return None
+        return self.versions.earliest_from(self.increment(pos, start_version))
+
+    # can_increment is about whether this position is prevented from incrementing by the state of previously released versions; needs_increment is about whether a position would be required to update based on the repo state.
+
+    def can_increment(self):
+        """return a list of incrementable positions"""
+        return [self.incrementable(x) for x in self.POSITIONS]
+
+    def a_needs_increment(self):
+        # we have changed or removed a test
+        if self.changes[self.DELETIONS] > 0:
+            return True
+        return False
+
+    def b_needs_increment(self):
+        # a test has been added
+        if self.changes[self.INSERTIONS] > 0:
+            return True
+        return False
+
+    # save us from increment_b if this is a bug test.
+    def c_needs_increment(self):
+        # we have insertions in bug_tests:
+        if self.bug_changes[self.INSERTIONS] > 0:
+            return True
+        return False
+
+    def d_needs_increment(self):
+        # basically two valid conditions
+        # 1 - we have commits since tag (that changed anything at all)
+        if self.committed[1] is not None:
+            return True
+        # 2 - we have uncommitted changes since tag (is this true? should we just ignore uncommitted changes? (this means we basically have to be committed?))
+        return self.dirty
+
+    def needs_increment(self):
+        """Returns the index which needs updating, or None."""
+        if self.a_needs_increment():
+            return self.A
+        elif self.b_needs_increment():
+            return self.B
+        elif self.c_needs_increment():
+            return self.C
+        elif self.d_needs_increment():
+            return self.D
+        else:
+            return None
+
+    def reasons(self, part):
+        """Explain, in plain words, why part has to increment."""
+        since = self.last_tag
+        if part == self.A:
+            return [
+                "%d test line(s) changed or removed since %s"
+                % (self.changes[self.DELETIONS], since)
+            ]
+        if part == self.B:
+            return [
+                "%d test line(s) added since %s" % (self.changes[self.INSERTIONS], since)
+            ]
+        if part == self.C:
+            return [
+                "%d bug test line(s) added since %s"
+                % (self.bug_changes[self.INSERTIONS], since)
+            ]
+        if part == self.D:
+            if self.committed[1] is not None:
+                return ["changes committed since %s" % since]
+            return ["uncommitted changes in the worktree"]
+        return []
+
+    def validate_version(self):
+        """Decide whether this build has been incremented following our rules."""
+        needs_increment = self.needs_increment()
+        if needs_increment is None:
+            return CheckResult(self.version)
+        new_version = self.increment(needs_increment)
+        reasons = self.reasons(needs_increment)
+        blocker = self.blocker(needs_increment)
+        if blocker is not None:
+            reasons.append("%s has already been released" % (blocker,))
+        return CheckResult(
+            self.version,
+            needs_increment,
+            new_version,
+            blocker is None,
+            reasons,
+            blocker,
+        )
+
+    def update_version(self):
+        """
+        Increment the authoritative version number if necessary.
+        """
+        if self.increment_version():
+            self.write_version()
+            return True
+        return False
+
+    def increment_version(self):
+        """Increment the tdver-internal version number."""
+        part = self.needs_increment()
+        if part is not None:
+            self.version = self.increment(part)
+            return self.version
+        return None
+
+    def version_string(self, version=None):
+        if version is None:
+            version = self.version
+        return str(Version(*version))
+
+    def relpath(self, name):
+        """name in the package's directory, relative to the top of the worktree."""
+        return self.path + "/" + name if self.path else name
+
+    def workfile(self, name):
+        """Path to a file at the top of the worktree, wherever we were started."""
+        return os.path.join(self.repo.workdir or os.getcwd(), name)
+
+    def config_text(self):
+        """tdver.json's contents, with the tdver-internal version made authoritative."""
+        self.config["version"] = self.version_string()
+        return json.dumps(self.config, sort_keys=True, indent=4)
+
+    def write_version(self):
+        """Write the tdver-internal version to file, making it authoritative."""
+
+        with open(self.workfile(self.relpath("tdver.json")), "w") as conf:
+            conf.write(self.config_text())
+
+    def tag_message(self):
+        return "Version %s released via TDVer" % self.version_string()
+
+    def tag_version(self):
+        """Creates a tag with the current version."""
+        return self.repo.create_tag(
+            self.prefix + self.version_string(),
+            self.repo.head.peel(pygit2.Commit).id,
+            odb.OBJECT_COMMIT,
+            self.author,
+            self.tag_message(),
+        )
+
+    @staticmethod
+    def format_tip(tip):
+        return "%s.x" % ".".join(str(part) for part in tip)
+
+    def get_tip(self, version=None):
+        if version is None:
+            version = self.version
+        version = Version(*version)
+        # this is the most recent of all releases; it is already "supported" by the edge development branch/master
+        if self.versions.successor(version) is None:
+            return None
+
+        # can we support the major version?
+        latest = self.versions.latest(version[: self.B])
+        if latest is not None and version[self.B] == latest[self.B]:
+            # most recent minor release under this major; valid for supporting the major.
+            return version[self.A : self.B]
+
+        # can we support the minor version?
+        latest = self.versions.latest(version[: self.C])
+        if latest is not None and version[self.C] == latest[self.C]:
+            return version[self.A : self.C]
+
+        # it makes no sense to provide long-term support for a bug or dev release, so we're done.
+        return None
+
+    # tdver start [at version <version>] | create the yml for enforcing tdver in current branch, possibly with a starting version
+    # open question: should I be raising errors or notifying the user if this already appears to be a tdv repo (it doesn't seem to matter; this isn't a destructive process and w/o a release does nothing--but if I make a decorator for this purpose I might as well)
+    # open question: need we do anything with the version at this point?
+    def start(self, version=None):
+        # only start touches yaml; don't make every other command pay for it
+        import yaml  # pylint: disable=import-outside-toplevel
+
+        validate_cmd = "tdver check"
+        if version is None:
+            # you literally can't release this version. even a dev release would be t0.0.0-1
+            # probably need to be really sure we won't ever accidentally get here, yeah?
+            # may be possible to create an "unreleasable" t0.0.0-0 tag?
+            self.version = Version(0, 0, 0, 0)
+
+        else:
+            raise NotImplementedError(
+                "No support yet for specifying a start version; making sure TDver actually works for new projects before letting you risk transitioning an existing project (unless you're persistent/convinced enough to implement this yourself. :)"
+            )
+
+        # TODO: the CI scaffolding is a good idea, but make it smrt or safe
+        with open(self.workfile(".travis.yml"), "a+") as yml:
+            # load existing conf
+            yml.seek(0, 0)
+            conf = yaml.safe_load(yml.read())
+            # make our changes
+            if conf:
+                if "script" in conf:
+                    # script could be a str or list; are we already in either?
+                    existing = conf["script"]
+                    if validate_cmd not in existing:
+                        if isinstance(existing, str):
+                            conf["script"] = [validate_cmd, conf["script"]]
+                        elif isinstance(existing, list):
+                            conf["script"] = [validate_cmd] + conf["script"]
+            else:
+                # sensible defaults?
+                conf = {"script": validate_cmd}
+
+            # save them
+            yml.seek(0, 0)
+            yml.truncate()
+            yml.write(yaml.dump(conf, default_flow_style=False))
+
+        self.write_version()
+        self.repo.index.read()
+        for filename in (".travis.yml", self.relpath("tdver.json")):
+            self.repo.index.add(filename)
+        self.repo.index.write()
+
+        new = self.version_string()
+
+        tree = self.repo.index.write_tree()
+        self.repo.create_commit(
+            odb.current_branch(self.repo),
+            self.author,
+            self.committer,
+            f"tdver: init at {new}\n\ndetailed commit message",
+            tree,  # binary string representing the tree object ID
+            [] if self.repo.head_is_unborn else [self.repo.head.target],
+        )
+
+        self.tag_version()
+
+        return "TDVer repository initialized."
+
+    def check(self):
+        return self.validate_version()
+
+    def audit(self, spec="HEAD"):
+        """
+        Yield an AuditResult for each tdver release in spec ("REV" or
+        "OLD..NEW"), oldest first, from a single pass over the range.
+        """
+        with self.repo.walking(spec) as graph:
+            yield from audit_releases(
+                self.repo,
+                spec,
+                self.tag_cache.tagged(self.prefix),
+                self.roots,
+                limit=self.walk_limit,
+                graph=graph,
+                partial="partial" in self.incomplete,
+                budget=self.diff_budget,
+            )
+
+    # create the YML file in branch, set it at version
+    # tdver release [branch] | create a release tag, probably push it
+    # advanced: push/don't, remote target, etc.
+    def release(self, write_worktree=True):
+        """
+        Commit the incremented tdver.json on top of HEAD and tag it.
+
+        The new tree is HEAD's with just tdver.json's blob swapped, and the
+        commit and tag are written straight to the object database; the
+        current branch then advances and the tag appears in one atomic ref
+        update, so a failed or concurrent release leaves nothing behind.
+        Neither the index nor the worktree is read, which also lets this
+        run in bare and sparse clones (see committed_config). With
+        write_worktree, tdver.json is written back to disk (even if a
+        sparse checkout had left it out) and its index entry updated
+        afterwards.
+        """
+        previous = self.version
+        if self.increment_version() is None:
+            return ReleaseResult(previous)
+        new = self.version_string()
+        branch = odb.current_branch(self.repo)
+        head = self.repo.head.peel(pygit2.Commit)
+        path = self.relpath("tdver.json")
+        text = self.config_text()
+
+        with profile.phase("release"):
+            tree = odb.tree_with(
+                self.repo, head.tree, path, self.repo.create_blob(text.encode("utf-8"))
+            )
+            commit = self.repo.create_commit(
+                None,  # the ref moves below, together with the tag
+                self.author,
+                self.committer,
+                f"tdver: {previous} -> {new}\n\ndetailed commit message",
+                tree,
+                [head.id],
+            )
+            name = self.prefix + new
+            tag = odb.write_tag(self.repo, name, commit, self.author, self.tag_message())
+            odb.update_refs(
+                self.repo,
+                {branch: (head.id, commit), "refs/tags/" + name: (None, tag)},
+                "tdver: release %s" % name,
+            )
+
+        if write_worktree and self.repo.workdir:
+            with profile.phase("worktree"):
+                os.makedirs(os.path.dirname(self.workfile(path)), exist_ok=True)
+                with open(self.workfile(path), "w") as conf:
+                    conf.write(text)
+                self.repo.index.read(False)
+                self.repo.index.add(path)
+                self.repo.index.write()
+        # push to origin? seems like this should be an option, even if it's default
+        # push could mean both tags and changes
+        return ReleaseResult(previous, self.version, str(commit), str(tag))
+
+    # tdver support [version] | create a branch and yml for a supported sub-release behind the primary release branch
+    def support(self):
+        tip = self.get_tip()
+        if tip:
+            tipstring = self.prefix + self.format_tip(tip)
+
+            if self.repo.references.get("refs/heads/" + tipstring) is not None:
+                return SupportResult(self.version, tipstring, existed=True)
+            self.repo.branches.local.create(
+                tipstring, self.repo.head.peel(pygit2.Commit)
+            )
+            # might not need a special YML; it seems like we can just infer this from the repo
+            return SupportResult(self.version, tipstring)
+
+        return SupportResult(self.version)
+
+    def plan_support(self):
+        """
+        Every maintenance branch the whole release history calls for, each
+        starting at the highest release on its line; see VersionIndex.tips.
+        """
+        commits = {}  # version -> the commit it was released from
+        for commit, tags in self.tag_cache.tagged(self.prefix).items():
+            for version, _, _ in tags:
+                commits[version] = commit
+        tips = []
+        for tip, version in self.versions.tips():
+            branch = self.prefix + self.format_tip(tip)
+            if self.repo.references.get("refs/heads/" + branch) is not None:
+                state = "exists"
+            elif version in commits:
+                state = "missing"
+            else:
+                continue  # its tag doesn't point at a commit
+            tips.append((branch, version, commits.get(version), state))
+        return SupportPlan(tips)
+
+    def support_all(self):
+        """Create every missing maintenance branch in one batch of ref updates."""
+        plan = self.plan_support()
+        missing = plan.missing
+        if not missing:
+            return plan
+        message = "branch: created by tdver support --all"
+        if hasattr(self.repo, "transaction"):
+            # all or nothing, under one lock
+            with self.repo.transaction() as txn:
+                for branch, _, commit, _ in missing:
+                    txn.lock_ref("refs/heads/" + branch)
+                    txn.set_target(
+                        "refs/heads/" + branch, pygit2.Oid(hex=commit), message=message
+                    )
+        else:  # pygit2 before reference transactions
+            for branch, _, commit, _ in missing:
+                self.repo.references.create(
+                    "refs/heads/" + branch, pygit2.Oid(hex=commit), message=message
+                )
+        plan.tips = [
+            tip[:3] + ("created",) if tip[3] == "missing" else tip for tip in plan.tips
+        ]
+        return plan
@@ -0,0 +1,169 @@
+"""`tdver fleet`: check many repositories in parallel, streaming a verdict per repo"""
+import os
+import time
+
+TIMEOUT = 120.0  # seconds one repository may take before its worker is killed
+
+
+def read_paths(lines):
+    """Repository paths, one per line; blank lines and #comments are skipped."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def evaluate(path, check_all=False):
+    """One repository's verdict as a JSON-ready dict; never raises."""
+    # pylint: disable=import-outside-toplevel
+    from .results import TDVerError
+    from .session import Session
+
+    try:
+        session = Session(path)
+        if (
+            not os.path.exists(os.path.join(session.workdir, "tdver.json"))
+            and session.repo.committed_config() is None
+        ):
+            return {"path": path, "ok": False, "error": "not a tdver repository"}
+        if not check_all:
+            return dict(session.check().as_dict(), path=path)
+        packages = {}
+        for package, result in session.check_all():
+            if isinstance(result, TDVerError):
+                packages[package] = {"ok": False, "error": str(result)}
+            else:
+                packages[package] = result.as_dict()
+        ok = all(result["ok"] for result in packages.values())
+        return {"path": path, "ok": ok, "packages": packages}
+    except TDVerError as e:
+        return {"path": path, "ok": False, "error": str(e)}
+    except Exception as e:  # pylint: disable=broad-except
+        return {"path": path, "ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+
+
+def work(conn, path, check_all):
+    start = time.perf_counter()
+    result = evaluate(path, check_all)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    conn.send(result)
+    conn.close()
+
+
+class Worker(object):
+    """A child process checking one repository, and when it has to give up."""
+
+    __slots__ = ("path", "process", "conn", "deadline", "start")
+
+    def __init__(self, context, path, check_all, timeout):
+        self.path = path
+        self.conn, child = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=work, args=(child, path, check_all), daemon=True
+        )
+        self.start = time.perf_counter()
+        self.deadline = self.start + timeout if timeout else None
+        self.process.start()
+        child.close()
+
+    def elapsed(self):
+        return round(time.perf_counter() - self.start, 4)
+
+    def result(self):
+        try:
+            result = self.conn.recv()
+        except EOFError:  # died without answering: segfault, os._exit, OOM...
+            self.process.join()
+            result = {
+                "path": self.path,
+                "ok": False,
+                "error": "worker exited with status %s" % self.process.exitcode,
+                "seconds": self.elapsed(),
+            }
+        self.close()
+        return result
+
+    def kill(self):
+        self.process.kill()
+        result = {
+            "path": self.path,
+            "ok": False,
+            "error": "timed out",
+            "timeout": True,
+            "seconds": self.elapsed(),
+        }
+        self.close()
+        return result
+
+    def close(self):
+        self.conn.close()
+        self.process.join(1)
+
+
+def sweep(paths, workers=None, timeout=TIMEOUT, check_all=False):
+    """
+    Check every repository in paths with up to `workers` running at once,
+    yielding each verdict as soon as it's in (so not in input order).
+
+    Every repository gets a fresh process, so one that hangs past
+    timeout (or crashes outright) is killed and reported on its own
+    without holding up, or taking down, any of the others.
+    """
+    # pylint: disable=import-outside-toplevel
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    )
+    workers = workers or os.cpu_count() or 1
+    pending = iter(paths)
+    running = {}  # connection -> Worker
+    while True:
+        while len(running) < workers:
+            path = next(pending, None)
+            if path is None:
+                break
+            worker = Worker(context, path, check_all, timeout)
+            running[worker.conn] = worker
+        if not running:
+            return
+        deadlines = [w.deadline for w in running.values() if w.deadline is not None]
+        wait_for = max(0, min(deadlines) - time.perf_counter()) if deadlines else None
+        for conn in wait(list(running), wait_for):
+            yield running.pop(conn).result()
+        now = time.perf_counter()
+        for conn, worker in list(running.items()):
+            if worker.deadline is not None and now >= worker.deadline:
+                yield running.pop(conn).kill()
+
+
+class Summary(object):
+    """Totals for the line `tdver fleet` ends with."""
+
+    __slots__ = ("total", "ok", "failed", "errors", "timeouts", "start")
+
+    def __init__(self):
+        self.total = self.ok = self.failed = self.errors = self.timeouts = 0
+        self.start = time.perf_counter()
+
+    def add(self, result):
+        self.total += 1
+        if result["ok"]:
+            self.ok += 1
+        elif result.get("timeout"):
+            self.timeouts += 1
+        elif "error" in result:
+            self.errors += 1
+        else:
+            self.failed += 1
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "ok": self.ok,
+            "failed": self.failed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "seconds": round(time.perf_counter() - self.start, 4),
+        }
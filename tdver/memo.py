@@ -0,0 +1,89 @@
+"""Persistent LRU of last_tag..HEAD results, keyed by both commits and the test roots"""
+import os
+import json
+import hashlib
+from . import profile
+from .classify import ChangeSummary
+from .tags import common_dir, save_json
+
+
+class ResultCache(object):
+    """
+    Maps (release commit, HEAD commit, test roots and diff budget) -> the per-root
+    line stats, files_changed and required part of the committed changes
+    between them, in <git dir>/tdver/results.idx.
+
+    Commits are immutable and the config is part of the key, so entries
+    never go stale; the file just keeps the `size` most recently used.
+    Nothing about the worktree is stored: when the commits changed nothing,
+    callers still have to run the dirty check themselves.
+    """
+
+    FORMAT = 2
+    SIZE = 512
+
+    def __init__(self, repo, size=SIZE):
+        self.path = os.path.join(common_dir(repo.path), "tdver", "results.idx")
+        self.size = size
+        self.entries = None  # key -> entry, least recently used first
+
+    @staticmethod
+    def key(base, head, roots, budget):
+        config = json.dumps([roots, budget.key()], sort_keys=True).encode()
+        return "%s..%s:%s" % (base, head, hashlib.sha1(config).hexdigest()[:16])
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = None
+            if cached and cached.get("format") == self.FORMAT:
+                self.entries = cached["entries"]
+            else:
+                self.entries = {}
+        return self.entries
+
+    def save(self):
+        save_json(self.path, {"format": self.FORMAT, "entries": self.entries})
+
+    def get(self, key, save=True):
+        """
+        Return (ChangeSummary, part) for key, or None. A hit becomes the
+        most recently used entry; pass save=False to batch, then save().
+        """
+        if not self.size:
+            return None
+        entries = self.load()
+        entry = entries.get(key)
+        if entry is None:
+            profile.count("result_miss")
+            return None
+        profile.count("result_hit")
+        if next(reversed(entries)) != key:
+            entries[key] = entries.pop(key)  # now the most recently used
+            if save:
+                self.save()
+        summary = ChangeSummary()
+        summary.roots = {name: list(counts) for name, counts in entry["roots"].items()}
+        summary.files_changed = entry["files_changed"]
+        return summary, entry["part"]
+
+    def put(self, key, summary, part, save=True):
+        """Remember a result; pass save=False to batch several, then save()."""
+        if not self.size:
+            return
+        if save:
+            self.entries = None  # merge into whatever other runs saved meanwhile
+        entries = self.load()
+        entries.pop(key, None)
+        entries[key] = {
+            "roots": summary.roots,
+            "files_changed": summary.files_changed,
+            "part": part,
+        }
+        while len(entries) > self.size:
+            del entries[next(iter(entries))]
+        if save:
+            self.save()
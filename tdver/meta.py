@@ -1,8 +1,14 @@
+"""tdver.json: its defaults, and reading it once, explicitly (never at import time)"""
 import json
-try:
-	with open("tdver.json", "r") as f:
-		config = json.load(f)  # pylint: disable=invalid-name
-except FileNotFoundError:
-	config = {}  # pylint: disable=invalid-name
-	# with open("tdver.json", "w") as f:
-	# 	json.dump(config, f, sort_keys=True, indent=4)
+
+NAME = "tdver.json"
+DEFAULTS = {"version": "0.0.0", "tests": "tests/", "bug_tests": "bugs/"}
+
+
+def load(path=NAME):
+    """Return the parsed tdver.json at path, or None if there isn't one."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,294 @@
+"""Find the highest tdver tag reachable from a commit with a bounded ancestor walk"""
+import os
+import mmap
+import struct
+import heapq
+from collections import namedtuple
+from . import profile
+
+NO_PARENT = 0x70000000
+OCTOPUS = 0x80000000
+
+# version: Version; name: tag name; tag: OID the tag ref points at (the tag
+# object for annotated tags); commit: the tagged commit; distance: commits
+# between the start of the walk and the tagged commit
+NearestTag = namedtuple("NearestTag", "version name tag commit distance")
+
+
+class CommitGraph(object):
+    """
+    Read-only view of a single .git/objects/info/commit-graph file, used
+    for parent lookups and generation numbers without inflating commits.
+    Split commit-graph chains aren't read; load() returns None for them.
+    """
+
+    def __init__(self, data):
+        if data[:4] != b"CGPH" or data[4] != 1:
+            raise ValueError("unsupported commit-graph")
+        self.data = data
+        self.hash_size = 32 if data[5] == 2 else 20
+        chunks = {}
+        pos = 8
+        for _ in range(data[6]):
+            chunk, offset = struct.unpack_from(">4sQ", data, pos)
+            chunks[chunk] = offset
+            pos += 12
+        self.fanout = chunks[b"OIDF"]
+        self.oids = chunks[b"OIDL"]
+        self.cdat = chunks[b"CDAT"]
+        self.edges = chunks.get(b"EDGE")
+        (self.count,) = struct.unpack_from(">I", data, self.fanout + 255 * 4)
+
+    @classmethod
+    def load(cls, git_dir):
+        path = os.path.join(git_dir, "objects", "info", "commit-graph")
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(data)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def oid(self, pos):
+        start = self.oids + pos * self.hash_size
+        return self.data[start : start + self.hash_size].hex()
+
+    def position(self, hexoid):
+        raw = bytes.fromhex(hexoid)
+        lo = 0
+        if raw[0]:
+            (lo,) = struct.unpack_from(">I", self.data, self.fanout + (raw[0] - 1) * 4)
+        (hi,) = struct.unpack_from(">I", self.data, self.fanout + raw[0] * 4)
+        size = self.hash_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.oids + mid * size
+            if self.data[start : start + size] < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        start = self.oids + lo * size
+        if lo < self.count and self.data[start : start + size] == raw:
+            return lo
+        return None
+
+    def commit(self, pos):
+        """Return (generation, [parent positions]) for the commit at pos."""
+        start = self.cdat + pos * (self.hash_size + 16) + self.hash_size
+        first, second, gen_time = struct.unpack_from(">IIQ", self.data, start)
+        parents = []
+        if first != NO_PARENT:
+            parents.append(first)
+        if second & OCTOPUS:
+            edge = second & ~OCTOPUS
+            while True:
+                (value,) = struct.unpack_from(">I", self.data, self.edges + edge * 4)
+                parents.append(value & ~OCTOPUS)
+                if value & OCTOPUS:
+                    break
+                edge += 1
+        elif second != NO_PARENT:
+            parents.append(second)
+        return gen_time >> 34, parents
+
+
+class AncestorWalk(object):
+    """
+    Parents and an ordering key for commits, from the commit-graph when it
+    covers a commit and from the object database otherwise.
+
+    Commits missing from the graph were written after it, so they sort
+    ahead of every graph commit; within each group, higher generation (or
+    later commit time) is walked first. Generations put every child
+    before its parents, but commit times can be skewed (or equal), so
+    without the graph a parent may be walked before one of its children.
+    """
+
+    def __init__(self, repo, graph=None):
+        self.repo = repo
+        self.graph = graph
+
+    def visit(self, hexoid):
+        """Return (sort key, parent hex OIDs)."""
+        if self.graph is not None:
+            pos = self.graph.position(hexoid)
+            if pos is not None:
+                profile.count("graph_commits")
+                generation, parents = self.graph.commit(pos)
+                return (0, generation), [self.graph.oid(p) for p in parents]
+        profile.count("odb_commits")
+        commit = self.repo[hexoid]
+        return (1, commit.commit_time), [str(p) for p in commit.parent_ids]
+
+
+class WalkLimitExceeded(Exception):
+    pass
+
+
+def nearest_tag(repo, start, tagged, limit=None, graph=None):
+    """
+    Walk ancestors of start (a hex OID) newest-first, stopping at tagged
+    commits instead of walking past them: tdver versions only grow along
+    history, so nothing behind a tag can outrank it. Returns the highest
+    NearestTag seen, or None when no tagged commit is reachable.
+
+    tagged maps commit hex OID -> [(version, name, tag hex OID), ...].
+    Raises WalkLimitExceeded if more than limit commits would be visited
+    before the frontier is exhausted.
+    """
+    walk = AncestorWalk(repo, graph)
+    queued = {start: walk.visit(start)}  # hex OID -> (sort key, parents)
+    heap = [(tuple(-k for k in queued[start][0]), start)]
+    depth = {start: 0}
+    walked = 0
+    best = None
+    with profile.phase("nearest_tag"):
+        while heap:
+            _, oid = heapq.heappop(heap)
+            walked += 1
+            if limit is not None and walked > limit:
+                raise WalkLimitExceeded(
+                    "walked %d commits back from %s without settling on a tag"
+                    % (limit, start)
+                )
+            if oid in tagged:
+                version, name, tag = max(tagged[oid])
+                if best is None or (version, -depth[oid]) > (
+                    best.version,
+                    -best.distance,
+                ):
+                    best = NearestTag(version, name, tag, oid, depth[oid])
+                continue
+            for parent in queued[oid][1]:
+                # usually final by then; see AncestorWalk for when it isn't
+                if parent in depth:
+                    depth[parent] = min(depth[parent], depth[oid] + 1)
+                    continue
+                depth[parent] = depth[oid] + 1
+                queued[parent] = walk.visit(parent)
+                heapq.heappush(heap, (tuple(-k for k in queued[parent][0]), parent))
+    return best
+
+
+def nearest_tags(repo, start, tagged, limit=None, graph=None):
+    """
+    nearest_tag() for several tag prefixes in one walk. tagged maps
+    prefix -> {commit hex OID: [(version, name, tag hex OID), ...]}.
+
+    Each commit carries the prefixes still unresolved on some path down
+    to it; a path stops once all of its prefixes have hit a tag. Returns
+    {prefix: NearestTag or None}.
+    """
+    walk = AncestorWalk(repo, graph)
+    queued = {start: walk.visit(start)}
+    heap = [(tuple(-k for k in queued[start][0]), start)]
+    depth = {start: 0}
+    pending = {start: set(tagged)}  # hex OID -> prefixes still open on the way here
+    walked = {}  # hex OID -> prefixes it has already been walked for
+    best = dict.fromkeys(tagged)
+    steps = 0
+    with profile.phase("nearest_tags"):
+        while heap:
+            _, oid = heapq.heappop(heap)
+            steps += 1
+            if limit is not None and steps > limit:
+                raise WalkLimitExceeded(
+                    "walked %d commits back from %s without settling on a tag"
+                    % (limit, start)
+                )
+            prefixes = pending.pop(oid)
+            walked.setdefault(oid, set()).update(prefixes)
+            still = set()
+            for prefix in prefixes:
+                if oid not in tagged[prefix]:
+                    still.add(prefix)
+                    continue
+                version, name, tag = max(tagged[prefix][oid])
+                found = best[prefix]
+                if found is None or (version, -depth[oid]) > (
+                    found.version,
+                    -found.distance,
+                ):
+                    best[prefix] = NearestTag(version, name, tag, oid, depth[oid])
+            parents = queued.pop(oid)[1]
+            if not still:
+                continue
+            for parent in parents:
+                if parent in pending:  # queued, not walked yet
+                    depth[parent] = min(depth[parent], depth[oid] + 1)
+                    pending[parent] |= still
+                    continue
+                # without a commit-graph, clock skew can walk a parent before
+                # this child; walk it again, but only for prefixes it lacked
+                more = still - walked.get(parent, set())
+                if not more:
+                    continue
+                depth[parent] = min(depth.get(parent, depth[oid] + 1), depth[oid] + 1)
+                pending[parent] = more
+                queued[parent] = walk.visit(parent)
+                heapq.heappush(heap, (tuple(-k for k in queued[parent][0]), parent))
+    return best
+
+
+def nearest_tag_each(repo, starts, tagged, limit=None, graph=None):
+    """
+    nearest_tag() from several start commits (hex OIDs) in one walk, so
+    history they share is only visited once. Returns {start: NearestTag or
+    None}.
+
+    Each commit carries its distance from every start that reaches it
+    without passing a tag. limit applies per start: the shared walk may
+    visit up to limit * len(starts) commits before giving up.
+    """
+    walk = AncestorWalk(repo, graph)
+    starts = sorted(set(starts))
+    queued = {}  # hex OID -> (sort key, parents), until it's walked
+    reached = {}  # hex OID -> {start: distance}, until it's walked
+    walked = {}  # hex OID -> starts it has already been walked for
+    heap = []
+    for start in starts:
+        queued[start] = walk.visit(start)
+        reached[start] = {start: 0}
+        heapq.heappush(heap, (tuple(-k for k in queued[start][0]), start))
+    if limit is not None:
+        limit *= max(len(starts), 1)
+    best = dict.fromkeys(starts)
+    steps = 0
+    with profile.phase("nearest_tag_each"):
+        while heap:
+            _, oid = heapq.heappop(heap)
+            steps += 1
+            if limit is not None and steps > limit:
+                raise WalkLimitExceeded(
+                    "walked %d commits back from %d refs without settling on a tag"
+                    % (limit, len(starts))
+                )
+            distances = reached.pop(oid)
+            parents = queued.pop(oid)[1]
+            walked.setdefault(oid, set()).update(distances)
+            if oid in tagged:
+                version, name, tag = max(tagged[oid])
+                for start, distance in distances.items():
+                    found = best[start]
+                    if found is None or (version, -distance) > (
+                        found.version,
+                        -found.distance,
+                    ):
+                        best[start] = NearestTag(version, name, tag, oid, distance)
+                continue
+            for parent in parents:
+                if parent in queued:  # not walked yet
+                    known = reached[parent]
+                    for start, distance in distances.items():
+                        known[start] = min(known.get(start, distance + 1), distance + 1)
+                    continue
+                # without a commit-graph, clock skew can walk a parent before
+                # this child; walk it again, but only for starts it lacked
+                done = walked.get(parent, ())
+                more = {s: d + 1 for s, d in distances.items() if s not in done}
+                if not more:
+                    continue
+                queued[parent] = walk.visit(parent)
+                reached[parent] = more
+                heapq.heappush(heap, (tuple(-k for k in queued[parent][0]), parent))
+    return best
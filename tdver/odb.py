@@ -0,0 +1,90 @@
+"""Build release commits and tags straight in the object database, then move refs atomically"""
+import pygit2
+from .classify import subtree
+from .results import TDVerError
+
+# pygit2 renamed these; accept either
+OBJECT_COMMIT = getattr(pygit2, "GIT_OBJECT_COMMIT", None) or pygit2.GIT_OBJ_COMMIT
+OBJECT_TAG = getattr(pygit2, "GIT_OBJECT_TAG", None) or pygit2.GIT_OBJ_TAG
+
+
+def current_branch(repo):
+    """The full ref HEAD points at (even if it has no commits yet)."""
+    head = repo.references.get("HEAD")
+    if head is None or not isinstance(head.target, str):
+        raise TDVerError("TDVer can't release from a detached HEAD; check out a branch.")
+    return head.target
+
+
+def tree_with(repo, tree, path, oid):
+    """
+    Write a copy of tree (or an empty tree, for None) with the blob oid
+    at path, rebuilding only the trees along that path. An existing
+    entry's file mode is kept; new files are regular.
+    """
+    name, _, rest = path.partition("/")
+    builder = repo.TreeBuilder(tree) if tree is not None else repo.TreeBuilder()
+    if rest:
+        below = subtree(tree, name) if tree is not None else None
+        builder.insert(name, tree_with(repo, below, rest, oid), pygit2.GIT_FILEMODE_TREE)
+    else:
+        entry = builder.get(name)
+        builder.insert(name, oid, entry.filemode if entry else pygit2.GIT_FILEMODE_BLOB)
+    return builder.write()
+
+
+def signature_line(sig):
+    offset = abs(sig.offset)
+    return "%s <%s> %d %s%02d%02d" % (
+        sig.name,
+        sig.email,
+        sig.time,
+        "-" if sig.offset < 0 else "+",
+        offset // 60,
+        offset % 60,
+    )
+
+
+def write_tag(repo, name, target, tagger, message):
+    """Write an annotated tag object for commit target without creating its ref."""
+    raw = "object %s\ntype commit\ntag %s\ntagger %s\n\n%s\n" % (
+        target,
+        name,
+        signature_line(tagger),
+        message.rstrip("\n"),
+    )
+    return repo.odb.write(OBJECT_TAG, raw.encode("utf-8"))
+
+
+def update_refs(repo, updates, message):
+    """
+    Apply {ref: (expected old OID or None for "must not exist", new OID)}
+    all at once, or not at all if any ref has moved in the meantime.
+    """
+    if hasattr(repo, "transaction"):
+        with repo.transaction() as txn:
+            for ref in updates:
+                txn.lock_ref(ref)
+            # locked, so nobody else can move them between this check and the commit
+            check_refs(repo, updates)
+            for ref, (_, new) in updates.items():
+                txn.set_target(ref, new, message=message)
+        return
+    # pygit2 before reference transactions: check, then update one by one
+    check_refs(repo, updates)
+    for ref, (old, new) in updates.items():
+        if old is None:
+            repo.references.create(ref, new, message=message)
+        else:
+            repo.references[ref].set_target(new, message)
+
+
+def check_refs(repo, updates):
+    for ref, (old, _) in updates.items():
+        current = repo.references.get(ref)
+        current = current.target if current is not None else None
+        if current != old:
+            raise TDVerError(
+                "%s moved while releasing (expected %s, found %s); nothing was changed."
+                % (ref, old, current)
+            )
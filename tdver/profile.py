@@ -0,0 +1,204 @@
+"""Opt-in per-phase timing, counters and peak memory (--profile / TDVER_PROFILE)"""
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from threading import get_ident
+
+try:
+    import resource
+except ImportError:  # unavailable on windows
+    resource = None
+
+FORMATS = ("table", "trace")
+ENV = "TDVER_PROFILE"
+ENV_FORMAT = "TDVER_PROFILE_FORMAT"
+ENV_OUT = "TDVER_PROFILE_OUT"
+ENV_PYMEM = "TDVER_PROFILE_PYMEM"
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+class Phase(object):
+    __slots__ = (
+        "name",
+        "start",
+        "end",
+        "depth",
+        "counters",
+        "peak",
+        "child_peak",
+        "rss",
+    )
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.start = time.perf_counter()
+        self.end = None
+        self.counters = {}
+        self.peak = 0
+        self.child_peak = 0
+        self.rss = None
+
+    @property
+    def wall(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Profiler(object):
+    """
+    Records a Phase per `with phase(name)` block, in the order they began.
+
+    The process's max RSS at the end of each phase covers libgit2's
+    allocations too. With pymem, tracemalloc also records the Python-side
+    peak, reset at the start of each phase (nested phases fold their peak
+    back into their parent); it slows allocation-heavy phases several
+    times over, so it's off unless asked for.
+
+    Phases only nest on the thread that enabled profiling; other threads'
+    phases are ignored, so their counters land in the phase that's open.
+    """
+
+    def __init__(self, pymem=False):
+        self.origin = time.perf_counter()
+        self.phases = []
+        self.stack = []
+        self.thread = get_ident()
+        self.pymem = None  # the tracemalloc module, once pymem asks for it
+        if pymem:
+            import tracemalloc  # pylint: disable=import-outside-toplevel
+
+            self.pymem = tracemalloc
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        if get_ident() != self.thread:
+            yield None
+            return
+        current = Phase(name, len(self.stack))
+        if self.pymem:
+            if self.stack:
+                parent = self.stack[-1]
+                parent.child_peak = max(
+                    parent.child_peak, self.pymem.get_traced_memory()[1]
+                )
+            self.pymem.reset_peak()
+        self.phases.append(current)
+        self.stack.append(current)
+        try:
+            yield current
+        finally:
+            current.end = time.perf_counter()
+            current.rss = max_rss_kb()
+            self.stack.pop()
+            if self.pymem:
+                current.peak = max(
+                    self.pymem.get_traced_memory()[1], current.child_peak
+                )
+                if self.stack:
+                    parent = self.stack[-1]
+                    parent.child_peak = max(parent.child_peak, current.peak)
+
+    def count(self, key, amount=1):
+        if self.stack:
+            counters = self.stack[-1].counters
+            counters[key] = counters.get(key, 0) + amount
+
+    def peak(self, key, value):
+        """Keep the largest value seen for key in the current phase."""
+        if self.stack:
+            counters = self.stack[-1].counters
+            counters[key] = max(counters.get(key, 0), value)
+
+    def table(self):
+        rows = [
+            "%-32s %10s %10s %10s  %s"
+            % ("phase", "wall ms", "py peak KB", "max rss KB", "counters")
+        ]
+        for record in self.phases:
+            rows.append(
+                "%-32s %10.2f %10s %10s  %s"
+                % (
+                    "  " * record.depth + record.name,
+                    record.wall * 1000,
+                    record.peak // 1024 if self.pymem else "-",
+                    record.rss if record.rss is not None else "-",
+                    " ".join("%s=%d" % kv for kv in sorted(record.counters.items())),
+                )
+            )
+        return "\n".join(rows)
+
+    def trace(self):
+        """Chrome trace-event JSON; load it in chrome://tracing or Perfetto."""
+        events = []
+        for record in self.phases:
+            args = dict(record.counters)
+            if self.pymem:
+                args["py_peak_kb"] = record.peak // 1024
+            if record.rss is not None:
+                args["max_rss_kb"] = record.rss
+            events.append(
+                {
+                    "name": record.name,
+                    "cat": "tdver",
+                    "ph": "X",
+                    "ts": (record.start - self.origin) * 1e6,
+                    "dur": record.wall * 1e6,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                    "args": args,
+                }
+            )
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, indent=1)
+
+    def report(self, fmt="table", path=None):
+        output = self.trace() if fmt == "trace" else self.table()
+        if path:
+            with open(path, "w") as f:
+                f.write(output + "\n")
+        else:
+            print(output, file=sys.stderr)
+
+
+class NullProfiler(object):
+    """Stands in when profiling is off so instrumented code pays ~nothing."""
+
+    @contextmanager
+    def phase(self, name):  # pylint: disable=unused-argument
+        yield None
+
+    def count(self, key, amount=1):
+        pass
+
+    def peak(self, key, value):
+        pass
+
+
+ACTIVE = NullProfiler()
+
+
+def enable(pymem=False):
+    global ACTIVE  # pylint: disable=global-statement
+    if not isinstance(ACTIVE, Profiler):
+        ACTIVE = Profiler(pymem)
+    return ACTIVE
+
+
+def phase(name):
+    return ACTIVE.phase(name)
+
+
+def count(key, amount=1):
+    ACTIVE.count(key, amount)
+
+
+def peak(key, value):
+    ACTIVE.peak(key, value)
@@ -0,0 +1,163 @@
+"""`tdver check --refs`: judge many branches at once against one tag index"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+import pygit2
+from . import meta, profile
+from .audit import required_part
+from .core import Repo, TDVer
+from .memo import ResultCache
+from .nearest import nearest_tag_each
+from .results import TDVerError
+
+
+def matches(name, pattern):
+    """Like git for-each-ref: a glob over the full ref name, or a prefix of it."""
+    return fnmatchcase(name, pattern) or name.startswith(pattern.rstrip("/") + "/")
+
+
+def matching(repo, patterns):
+    """[(ref name, commit hex OID)] for every direct ref matching a pattern, sorted."""
+    found = []
+    for name in repo.references:
+        if not any(matches(name, pattern) for pattern in patterns):
+            continue
+        ref = repo.references[name]
+        if not isinstance(ref.target, pygit2.Oid):
+            continue  # symbolic, like refs/remotes/origin/HEAD
+        try:
+            commit = ref.peel(pygit2.Commit)
+        except (pygit2.GitError, ValueError):
+            continue  # a tag of a tree or blob
+        found.append((name, str(commit.id)))
+    return sorted(found)
+
+
+class RefChecker(object):
+    """
+    Check many refs for one package with the work they have in common
+    done once: the tags are parsed once, one ancestor walk finds every
+    ref's last release (one per tag prefix, if the refs' configs differ
+    there), and the result cache is read and written once.
+
+    Each ref is judged by the package's tdver.json as committed on that
+    ref, with any overrides layered on top, not by the checked-out one.
+
+    The per-ref diffs of the test roots then run on a thread pool, each
+    thread with its own handle on the repository (libgit2 objects aren't
+    safe to share between threads; its object database is).
+    """
+
+    def __init__(self, tdver, workers=None, overrides=None):
+        self.tdver = tdver
+        self.workers = workers or os.cpu_count() or 1
+        self.overrides = dict(overrides or {})
+        self.local = threading.local()
+
+    def repo(self):
+        """This thread's own handle on the repository."""
+        repo = getattr(self.local, "repo", None)
+        if repo is None:
+            repo = self.local.repo = Repo(self.tdver.repo.path)
+        return repo
+
+    def configure(self, name, commit):
+        """A TDVer for the package as committed at commit, sharing what it can."""
+        tdver = self.tdver
+        config = tdver.repo.committed_config(tdver.path, commit)
+        if config is None:
+            raise TDVerError(
+                "TDVer couldn't find %s on %s." % (tdver.relpath(meta.NAME), name)
+            )
+        config.update(self.overrides)
+        judged = TDVer(config, tag_cache=tdver.tag_cache, path=tdver.path)
+        judged.diff_budget  # pylint: disable=pointless-statement
+        if judged.prefix == tdver.prefix:  # both raise if it's misconfigured
+            judged.versions = tdver.versions
+        judged.incomplete = tdver.incomplete
+        judged.head = pygit2.Oid(hex=commit)
+        judged.dirty = False  # a ref has no worktree; only commits count
+        return judged
+
+    def find_versions(self, judged):
+        """
+        Set every TDVer's nearest release, with one walk back from all of
+        their commits for each tag prefix they use.
+        """
+        repo = self.tdver.repo
+        prefixes = {}
+        for one in judged:
+            if not isinstance(one, TDVerError):
+                prefixes.setdefault(one.prefix, []).append(one)
+        for prefix, group in prefixes.items():
+            with repo.walking("the matching refs") as graph:
+                found = nearest_tag_each(
+                    repo,
+                    [str(one.head) for one in group],
+                    self.tdver.tag_cache.tagged(prefix),
+                    limit=max(one.walk_limit for one in group),
+                    graph=graph,
+                )
+            for one in group:
+                one.nearest = found[str(one.head)]
+
+    def diff(self, judged):
+        """Classify one ref's changes since its release, on a worker thread."""
+        if isinstance(judged, TDVerError) or "committed" in vars(judged):
+            return judged
+        judged.repo = self.repo()
+        try:
+            summary = judged.find_changes()
+            part = required_part(summary, judged.tree_changed())
+        except TDVerError as e:
+            return e
+        judged.committed = (summary, part)
+        return judged
+
+    def check(self, patterns):
+        """
+        Yield (ref name, commit hex OID, CheckResult or TDVerError) for every
+        ref matching patterns, in ref name order, each as soon as it and
+        every ref before it are judged.
+        """
+        tdver = self.tdver
+        judged = []  # per ref: TDVer or TDVerError
+        with profile.phase("refs"):
+            refs = matching(tdver.repo, patterns)
+            for name, commit in refs:
+                try:
+                    judged.append(self.configure(name, commit))
+                except TDVerError as e:
+                    judged.append(e)
+            self.find_versions(judged)
+        cache = tdver.result_cache
+        keys = []  # per ref: its cache key if it missed
+        for i, (name, _) in enumerate(refs):
+            one = judged[i]
+            if not isinstance(one, TDVerError) and one.nearest is None:
+                one = judged[i] = tdver.repo.no_release(name)
+            if isinstance(one, TDVerError):
+                keys.append(None)
+                continue
+            key = ResultCache.key(
+                one.nearest.commit, one.head, one.roots, one.diff_budget
+            )
+            hit = cache.get(key, save=False)
+            if hit is not None:
+                one.committed = hit
+                key = None
+            keys.append(key)
+
+        # the profiler ignores the workers' own phases; their counters land here
+        with profile.phase("diffs"), ThreadPoolExecutor(self.workers) as pool:
+            results = pool.map(self.diff, judged)
+            for (name, commit), key, one in zip(refs, keys, results):
+                if isinstance(one, TDVerError):
+                    yield name, commit, one
+                    continue
+                if key is not None and not one.committed[0].missing:
+                    cache.put(key, *one.committed, save=False)
+                yield name, commit, one.check()
+        if cache.entries is not None:  # read, so maybe reordered or added to
+            cache.save()
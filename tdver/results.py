@@ -0,0 +1,262 @@
+"""Structured outcomes of check/release/support for in-process callers"""
+
+PARTS = ["a", "b", "c", "d"]
+
+
+class TDVerError(Exception):
+    """The repository can't be evaluated (not a repo, no release tag, ...)."""
+
+
+class HistoryIncomplete(TDVerError):
+    """
+    A shallow or partial clone is missing objects the verdict depends on;
+    fetching more of the repository would settle it.
+    """
+
+    def __init__(self, missing, advice):
+        super().__init__("TDVer needs deeper history: %s; %s." % (missing, advice))
+
+
+class CheckResult(object):
+    """
+    What `tdver check` decided: the current release, which part (if any)
+    this changeset requires incrementing, the version that would produce,
+    whether that version is still available (if not, the release in its
+    way), and why.
+    """
+
+    __slots__ = (
+        "current",
+        "part",
+        "required",
+        "incrementable",
+        "reasons",
+        "blocked_by",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        current,
+        part=None,
+        required=None,
+        incrementable=True,
+        reasons=(),
+        blocked_by=None,
+    ):
+        self.current = current
+        self.part = part
+        self.required = required
+        self.incrementable = incrementable
+        self.reasons = list(reasons)
+        self.blocked_by = blocked_by
+
+    @property
+    def ok(self):
+        """The current version is valid for this changeset."""
+        return self.part is None
+
+    @property
+    def part_name(self):
+        return PARTS[self.part] if self.part is not None else None
+
+    @property
+    def message(self):
+        if self.ok:
+            return str(self.current)
+        if self.incrementable:  # these messages can be vastly better
+            return "\n".join(
+                [
+                    " Current version: %s" % (self.current,),
+                    "Required version: %s" % (self.required,),
+                    "Version part %s must increment for this changeset per TDVer rules."
+                    % self.part_name.title(),
+                ]
+            )
+        # these changes require an increment to part X, but part X may not increment because a later release is in the way.
+        if self.blocked_by is not None and self.blocked_by != self.required:
+            return (
+                "This changeset requires an increment to the %s version part per TDVer rules (to %s), but %s has already been released."
+                % (self.part_name, self.required, self.blocked_by)
+            )
+        return (
+            "This changeset requires an increment to the %s version part per TDVer rules, but the specified version (%s) already exists."
+            % (self.part_name, self.required)
+        )
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "current": str(self.current),
+            "part": self.part_name,
+            "required": str(self.required) if self.required is not None else None,
+            "incrementable": self.incrementable,
+            "blocked_by": str(self.blocked_by) if self.blocked_by is not None else None,
+            "reasons": self.reasons,
+        }
+
+    def __repr__(self):
+        return "CheckResult(%r)" % self.as_dict()
+
+
+class ReleaseResult(object):
+    """The version `tdver release` moved from and to, with the new commit and tag."""
+
+    __slots__ = ("previous", "new", "commit", "tag")
+
+    def __init__(self, previous, new=None, commit=None, tag=None):
+        self.previous = previous
+        self.new = new
+        self.commit = commit
+        self.tag = tag
+
+    @property
+    def ok(self):
+        return self.new is not None
+
+    @property
+    def message(self):
+        if self.ok:
+            return "Updated version.\nold: %s\nnew: %s" % (str(self.previous), str(self.new))
+        # this is a really poor message. In some cases we get here because we've already released the most-current possible version
+        # but in others we get here because we can't increment
+        return "A release doesn't seem to be possible."
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "previous": str(self.previous),
+            "new": str(self.new) if self.new is not None else None,
+            "commit": self.commit,
+            "tag": self.tag,
+        }
+
+    def __repr__(self):
+        return "ReleaseResult(%r)" % self.as_dict()
+
+
+class SupportResult(object):
+    """The maintenance branch `tdver support` created, if the version is maintainable."""
+
+    __slots__ = ("version", "branch", "existed")
+
+    def __init__(self, version, branch=None, existed=False):
+        self.version = version
+        self.branch = branch
+        self.existed = existed
+
+    @property
+    def ok(self):
+        return self.branch is not None
+
+    @property
+    def message(self):
+        if self.existed:
+            return "Maintenance branch %s already exists." % self.branch
+        if self.ok:
+            return "Maintenance branch %s created." % self.branch
+        return "This version can't be maintained; either it is the edge version or the minor and patch positions may not increment."
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "version": str(self.version),
+            "branch": self.branch,
+            "existed": self.existed,
+        }
+
+    def __repr__(self):
+        return "SupportResult(%r)" % self.as_dict()
+
+
+class SupportPlan(object):
+    """
+    Every maintenance branch the release history calls for (`tdver
+    support --plan`/`--all`), as (branch, version, commit, state) rows;
+    state is "exists", "missing", or "created" once --all has made it.
+    """
+
+    __slots__ = ("tips",)
+
+    def __init__(self, tips=()):
+        self.tips = list(tips)
+
+    @property
+    def ok(self):
+        return True
+
+    @property
+    def missing(self):
+        return [tip for tip in self.tips if tip[3] == "missing"]
+
+    @property
+    def message(self):
+        if not self.tips:
+            return "No version can be maintained yet."
+        width = max(len(tip[0]) for tip in self.tips)
+        return "\n".join(
+            "%-*s  %-12s %s" % (width, branch, str(version), state)
+            for branch, version, _, state in self.tips
+        )
+
+    def as_dict(self):
+        return {
+            "ok": self.ok,
+            "tips": [
+                {"branch": branch, "version": str(version), "commit": commit, "state": state}
+                for branch, version, commit, state in self.tips
+            ],
+        }
+
+    def __repr__(self):
+        return "SupportPlan(%r)" % self.as_dict()
+
+
+class AuditResult(object):
+    """
+    One tagged commit's verdict from `tdver audit`: the version the
+    changes since the previous release required, against the one tagged.
+    """
+
+    __slots__ = ("release", "previous", "part", "required", "summary")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, release, previous=None, part=None, required=None, summary=None
+    ):
+        self.release = release
+        self.previous = previous
+        self.part = part
+        self.required = required
+        self.summary = summary
+
+    @property
+    def ok(self):
+        """The first release, or exactly the increment its changes called for."""
+        return self.previous is None or tuple(self.release.version) == tuple(
+            self.required
+        )
+
+    @property
+    def part_name(self):
+        return PARTS[self.part] if self.part is not None else None
+
+    def as_dict(self):
+        previous = self.previous
+        return {
+            "ok": self.ok,
+            "commit": self.release.commit,
+            "tag": self.release.name,
+            "version": str(self.release.version),
+            "previous": str(previous.version) if previous else None,
+            "previous_tag": previous.name if previous else None,
+            "distance": previous.distance if previous else None,
+            "part": self.part_name,
+            "required": str(self.required) if self.required is not None else None,
+            "changes": {
+                name: list(counts) for name, counts in self.summary.roots.items()
+            }
+            if self.summary
+            else {},
+        }
+
+    def __repr__(self):
+        return "AuditResult(%r)" % self.as_dict()
@@ -0,0 +1,72 @@
+"""`tdver serve` client: hand check/support to a running daemon, if there is one"""
+import os
+import json
+import socket
+
+ENV_OFF = "TDVER_NO_DAEMON"  # set to always run in-process
+COMMANDS = ("check", "support", "ping", "stop")
+
+# seconds to wait for a daemon before doing the work in-process instead, so
+# a wedged daemon slows every check down rather than hanging it (and a hook)
+CONNECT_TIMEOUT = 1.0
+REPLY_TIMEOUT = 10.0
+
+
+def find_repository(path):
+    """
+    (top of the worktree, git directory) for the worktree containing path,
+    or None; found without opening the repository so a client never has
+    to import pygit2.
+    """
+    path = os.path.abspath(path)
+    while True:
+        dotgit = os.path.join(path, ".git")
+        if os.path.isdir(dotgit):
+            return path, dotgit
+        if os.path.isfile(dotgit):  # linked worktree or submodule
+            try:
+                with open(dotgit, "r") as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith("gitdir:"):
+                return path, os.path.normpath(os.path.join(path, line[7:].strip()))
+            return None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def socket_path(gitdir):
+    return os.path.join(gitdir, "tdver", "serve.sock")
+
+
+def request(path, command, timeout=REPLY_TIMEOUT):
+    """
+    Ask the daemon serving the repository at path to run command for the
+    package at path (its directory relative to the top of the worktree).
+    Returns its reply, or None if no daemon is listening or it doesn't
+    answer within timeout seconds (the caller should then do the work
+    itself).
+    """
+    found = find_repository(path)
+    if found is None:
+        return None
+    top, gitdir = found
+    package = os.path.relpath(os.path.abspath(path), top).replace(os.sep, "/")
+    message = {"command": command, "path": "" if package == "." else package}
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(min(CONNECT_TIMEOUT, timeout))
+        sock.connect(socket_path(gitdir))
+        sock.settimeout(timeout)
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(message).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+        return json.loads(line) if line else None
+    except (OSError, ValueError):  # including socket.timeout
+        return None
+    finally:
+        sock.close()
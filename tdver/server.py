@@ -0,0 +1,84 @@
+"""`tdver serve`: answer check/support for one repository over a Unix socket"""
+import os
+import json
+import signal
+import socketserver
+from .serve import COMMANDS, CONNECT_TIMEOUT, request, socket_path
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            message = json.loads(line)
+            command, package = message["command"], message.get("path", "")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            command, package = None, ""
+        reply = self.server.dispatch(command, package)
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    One repository's Session, kept warm between requests for each package
+    they come from. Requests are handled one at a time, so the session
+    is never used concurrently.
+
+    Nothing is watched in the background: every request stats HEAD,
+    the tag refs and tdver.json, and only recomputes when they moved (see
+    Session.warm). The worktree's dirty state is re-checked every time.
+    """
+
+    timeout = 0.5  # how often run() looks up from accept() to notice SIGTERM
+
+    def __init__(self, session):
+        self.session = session
+        self.running = True
+        path = socket_path(session.repo.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            if request(session.workdir, "ping", CONNECT_TIMEOUT) is not None:
+                raise OSError("tdver is already serving %s" % session.workdir)
+            os.unlink(path)  # stale; its daemon died without cleaning up
+        super().__init__(path, Handler)
+
+    def dispatch(self, command, package=""):
+        """Run command for the package at path package ("" for the top)."""
+        # pylint: disable=import-outside-toplevel
+        from .results import TDVerError
+
+        if command not in COMMANDS:
+            return {"error": "unknown command %r" % (command,)}
+        if (
+            not isinstance(package, str)
+            or os.path.isabs(package)
+            or package.split("/")[0] == ".."
+        ):
+            return {"error": "not a package in this repository: %r" % (package,)}
+        if command == "ping":
+            return {"ok": True}
+        if command == "stop":
+            self.running = False
+            return {"ok": True}
+        try:
+            result = getattr(self.session, command)(package)
+        except TDVerError as e:
+            return {"error": str(e)}
+        return {"ok": result.ok, "message": result.message, "result": result.as_dict()}
+
+    def run(self):
+        def stop(*_):
+            self.running = False
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            while self.running:
+                self.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
@@ -0,0 +1,124 @@
+"""A warm, reusable handle for evaluating one repository many times in-process"""
+import os
+import json
+import pygit2
+from . import profile
+from .core import Repo, TDVer
+from .tags import TagCache, stat_stamp
+
+
+class Session(object):
+    """
+    Keeps one open repository and its parsed tag index across calls, so
+    a long-running service can check it repeatedly without paying for
+    process startup, imports or tag parsing each time:
+
+        session = Session("/path/to/repo")
+        result = session.check()
+        if not result.ok:
+            print(result.part_name, result.required, result.reasons)
+
+    In a monorepo, check and support take a package's directory relative
+    to the top of the worktree (check("pkgs/foo")); "" is the top-level
+    package. Each package's tdver.json is re-read whenever it changes;
+    any config passed in here is layered on top of it. check and support
+    reuse a package's previous diff and release lookup until HEAD, the
+    tags or its tdver.json move; whether the worktree is dirty is always
+    re-checked.
+    """
+
+    def __init__(self, path=".", config=None):
+        self.repo = Repo.open(os.path.abspath(path))
+        self.overrides = dict(config or {})
+        self.tag_cache = TagCache(self.repo, TDVer.parse_tag)
+        self.cached = {}  # package -> (state(), TDVer) from its last check/support
+
+    @property
+    def workdir(self):
+        return self.repo.workdir or self.repo.path
+
+    def load_config(self, package="", committed=False):
+        """
+        The package's tdver.json from disk, or as committed at HEAD when it
+        isn't on disk (bare and sparse clones) or when committed is set.
+        """
+        config = None
+        if not committed:
+            try:
+                with open(os.path.join(self.workdir, package, "tdver.json")) as conf:
+                    config = json.load(conf)
+            except FileNotFoundError:
+                pass
+        if config is None:
+            config = self.repo.committed_config(package) or {}
+        config.update(self.overrides)
+        return config
+
+    def tdver(self, package="", committed=False):
+        """A TDVer for a package's current state, sharing our warm caches."""
+        return TDVer(
+            self.load_config(package, committed),
+            repo=self.repo,
+            tag_cache=self.tag_cache,
+            path=package,
+        )
+
+    def state(self, package=""):
+        """Everything a package's cached answers depend on, bar the worktree."""
+        try:
+            head = str(self.repo.head.target)
+        except pygit2.GitError:  # unborn branch
+            head = None
+        return (
+            head,
+            self.tag_cache.stamps(),
+            stat_stamp(os.path.join(self.workdir, package, "tdver.json")),
+        )
+
+    def warm(self, package=""):
+        """A package's last TDVer, unless the state it was computed from has moved."""
+        state = self.state(package)
+        cached = self.cached.get(package)
+        if cached is None or cached[0] != state:
+            profile.count("warm_miss")
+            cached = self.cached[package] = (state, self.tdver(package))
+        else:
+            profile.count("warm_hit")
+            vars(cached[1]).pop("dirty", None)  # the worktree may have moved
+        return cached[1]
+
+    def check(self, package=""):
+        """Return a CheckResult for HEAD (plus any uncommitted changes)."""
+        return self.warm(package).check()
+
+    def check_all(self):
+        """Return [(path, CheckResult or TDVerError)] for every tdver.json package."""
+        from .workspace import Workspace  # pylint: disable=import-outside-toplevel
+
+        return Workspace(self.repo, self.tag_cache, self.overrides).check()
+
+    def check_refs(self, patterns, workers=None):
+        """
+        Return [(ref name, commit, CheckResult or TDVerError)] for every ref
+        matching patterns (see `tdver check --refs`).
+        """
+        from .refs import RefChecker  # pylint: disable=import-outside-toplevel
+
+        checker = RefChecker(self.tdver(), workers, self.overrides)
+        return list(checker.check(patterns))
+
+    def audit(self, spec="HEAD"):
+        """Yield an AuditResult for each release in spec, oldest first."""
+        return self.tdver().audit(spec)
+
+    def release(self, write_worktree=True):
+        """
+        Commit and tag the next release; returns a ReleaseResult. Without
+        write_worktree, the committed tdver.json is the one released.
+        """
+        self.cached = {}
+        return self.tdver(committed=not write_worktree).release(write_worktree)
+
+    def support(self, package=""):
+        """Create a maintenance branch for HEAD's release; returns a SupportResult."""
+        return self.warm(package).support()
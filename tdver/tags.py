@@ -0,0 +1,170 @@
+"""Persistent cache of parsed tdver tags, kept under the git directory"""
+import os
+import json
+import pygit2
+from . import profile
+from .versions import Version
+
+TAG_PREFIX = "refs/tags/"
+
+
+def common_dir(git_dir):
+    """Linked worktrees keep refs in the main repository's git directory."""
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r") as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except FileNotFoundError:
+        return git_dir
+
+
+def stat_stamp(path):
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [info.st_ino, info.st_size, info.st_mtime_ns]
+
+
+def tag_prefix(name):
+    """A tag's namespace: "" for bare versions, "pkg/" for "pkg/1.2.3"."""
+    return name[: name.rfind("/") + 1]
+
+
+def save_json(path, data):
+    """Atomically replace path; failures are ignored, since caches are optional."""
+    tmp = "%s.%d" % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        # read-only checkout or similar; the cache is only an optimization
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+class TagCache(object):
+    """
+    Maps tag name -> (target OID, parsed version, tagged commit OID) in
+    <git dir>/tdver/tags.idx, with the sorted versions of each tag prefix
+    (see tag_prefix; monorepo packages tag as "<prefix><version>").
+
+    The cache is stamped with the state of packed-refs and of every
+    directory under refs/tags (adding, removing or rewriting a loose tag
+    always touches its directory). When the stamps match, the sorted
+    version list is returned straight from disk without enumerating refs;
+    otherwise only tags that are new or now point elsewhere get re-parsed.
+    """
+
+    FORMAT = 4
+
+    def __init__(self, repo, parse):
+        self.repo = repo
+        self.parse = parse  # tag name -> version or None
+        self.memo = None  # the contents as of the last index() call
+        self.grouped = None  # (memo, tagged() for every prefix) it was built from
+        self.git_dir = common_dir(repo.path)
+        self.path = os.path.join(self.git_dir, "tdver", "tags.idx")
+
+    def stamps(self):
+        loose = {}
+        top = os.path.join(self.git_dir, "refs", "tags")
+        for path, _, _ in os.walk(top):
+            loose[os.path.relpath(path, top)] = stat_stamp(path)
+        return {
+            "packed": stat_stamp(os.path.join(self.git_dir, "packed-refs")),
+            "loose": loose,
+        }
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("format") != self.FORMAT:
+            return None
+        return cached
+
+    def save(self, cached):
+        save_json(self.path, cached)
+
+    def peel(self, oid):
+        """The commit a tag points at, or None for tags of trees/blobs."""
+        try:
+            return str(self.repo[oid].peel(pygit2.Commit).id)
+        except (KeyError, ValueError, pygit2.GitError):
+            return None
+
+    def refresh(self, tags, stamps):
+        """Bring the {name: [oid, version, commit]} map in line with the current refs."""
+        current = {}
+        for ref in self.repo.references:
+            profile.count("refs")
+            if not ref.startswith(TAG_PREFIX):
+                continue
+            name = ref[len(TAG_PREFIX) :]
+            oid = str(self.repo.references[ref].target)
+            known = tags.get(name)
+            if known is not None and known[0] == oid:
+                current[name] = known
+            else:
+                profile.count("parsed")
+                version = self.parse(name[len(tag_prefix(name)) :])
+                version = list(version) if version else None  # as json will load it
+                current[name] = [oid, version, self.peel(oid) if version else None]
+        versions = {}
+        for name, (_, version, _) in current.items():
+            if version:
+                versions.setdefault(tag_prefix(name), []).append(version)
+        for found in versions.values():
+            found.sort()
+        return {
+            "format": self.FORMAT,
+            "stamps": stamps,
+            "tags": current,
+            "versions": versions,
+        }
+
+    def index(self):
+        """
+        Return the up-to-date cache contents, rebuilding only what changed.
+        A long-lived TagCache (see Session) skips re-reading the file as
+        long as the ref stamps haven't moved since its last call.
+        """
+        with profile.phase("tags"):
+            stamps = self.stamps()
+            if self.memo is not None and self.memo["stamps"] == stamps:
+                profile.count("memo_hit")
+                return self.memo
+            cached = self.load()
+            if cached is not None and cached.get("stamps") == stamps:
+                profile.count("cache_hit")
+            else:
+                with profile.phase("tags.refresh"):
+                    cached = self.refresh(cached["tags"] if cached else {}, stamps)
+                self.save(cached)
+            self.memo = cached
+            return cached
+
+    def versions(self, prefix=""):
+        return self.index()["versions"].get(prefix, [])
+
+    def tagged_by_prefix(self):
+        """Return {prefix: tagged(prefix)} for every prefix, from one pass."""
+        index = self.index()
+        if self.grouped is None or self.grouped[0] is not index:
+            prefixes = {}
+            for name, (oid, version, commit) in index["tags"].items():
+                if version and commit:
+                    commits = prefixes.setdefault(tag_prefix(name), {})
+                    commits.setdefault(commit, []).append((Version(*version), name, oid))
+            self.grouped = (index, prefixes)
+        return self.grouped[1]
+
+    def tagged(self, prefix=""):
+        """Return {commit OID: [(version, tag name, tag OID), ...]} for tdver tags."""
+        return self.tagged_by_prefix().get(prefix, {})
@@ -0,0 +1,122 @@
+"""Immutable versions and a sorted index answering TDVer's lookups in O(log n)"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+
+class Version(namedtuple("Version", "a b c d")):
+    """An immutable A.B.C-D version; compares and hashes like a plain tuple."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        if self.d > 0:
+            return "%d.%d.%d-%d" % self
+        return "%d.%d.%d" % self[:3]
+
+    def increment(self, pos):
+        """Return a copy with part pos bumped and every later part zeroed."""
+        return Version(
+            *(
+                part + 1 if i == pos else 0 if i > pos else part
+                for i, part in enumerate(self)
+            )
+        )
+
+
+def prefix_end(prefix):
+    """The smallest tuple sorting after every version that starts with prefix."""
+    return prefix[:-1] + (prefix[-1] + 1,)
+
+
+class VersionIndex(object):
+    """
+    Every released version in one ascending, bisect-searchable array, plus
+    the latest release under each major (A) and each minor (A, B), which
+    are filled in by the same single pass that builds the array.
+    """
+
+    __slots__ = ("versions", "majors", "minors")
+
+    def __init__(self, versions=(), presorted=False):
+        versions = [Version(*v) for v in versions]
+        if not presorted:
+            versions.sort()
+        self.versions = versions
+        self.majors = {}
+        self.minors = {}
+        for version in versions:
+            # ascending, so the last one written for each key is its latest
+            self.majors[version[:1]] = version
+            self.minors[version[:2]] = version
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __iter__(self):
+        return iter(self.versions)
+
+    def __reversed__(self):
+        return reversed(self.versions)
+
+    def __contains__(self, version):
+        return self.exists(version)
+
+    def exists(self, version):
+        i = bisect_left(self.versions, tuple(version))
+        return i < len(self.versions) and self.versions[i] == tuple(version)
+
+    def latest(self, prefix=()):
+        """Return the highest version starting with prefix (e.g. (A,) or (A, B)), or None."""
+        prefix = tuple(prefix)
+        if not prefix:
+            return self.versions[-1] if self.versions else None
+        if len(prefix) == 1:
+            return self.majors.get(prefix)
+        if len(prefix) == 2:
+            return self.minors.get(prefix)
+        i = bisect_left(self.versions, prefix_end(prefix))
+        if i and self.versions[i - 1][: len(prefix)] == prefix:
+            return self.versions[i - 1]
+        return None
+
+    def successor(self, version):
+        """Return the next-highest released version after version, or None."""
+        i = bisect_right(self.versions, tuple(version))
+        return self.versions[i] if i < len(self.versions) else None
+
+    def earliest_from(self, version):
+        """Return the lowest released version at or after version, or None."""
+        i = bisect_left(self.versions, tuple(version))
+        return self.versions[i] if i < len(self.versions) else None
+
+    def next_exists(self, version, pos):
+        """Has anything at or past version's increment at pos been released under the same prefix?"""
+        latest = self.latest(version[:pos])
+        return latest is not None and latest >= Version(*version).increment(pos)
+
+    def tips(self):
+        """
+        Every (tip, version) get_tip would return a tip for, in one pass:
+        (A,) for the latest minor line of each major and (A, B) for every
+        older minor, each paired with the highest release on that line.
+        The newest release is the edge, so it never starts a branch; its
+        own line is maintained from the release before it, if any.
+        """
+        found = []
+        versions = self.versions
+        last = len(versions) - 1
+        for i, version in enumerate(versions):
+            following = versions[i + 1] if i < last else None
+            if following is not None and following[:2] == version[:2]:
+                continue  # not the end of its minor line
+            if following is not None and following[0] != version[0]:
+                found.append((version[:1], version))  # end of its major, too
+            elif following is not None:
+                found.append((version[:2], version))
+            else:
+                j = i - 1
+                while j >= 0 and versions[j] == version:
+                    j -= 1
+                if j >= 0 and versions[j][:2] == version[:2]:
+                    found.append((version[:1], versions[j]))
+        return found
@@ -0,0 +1,245 @@
+"""Monorepo mode: every tdver.json package in a repository, evaluated together"""
+import os
+import json
+import pygit2
+from functools import cached_property
+from . import profile
+from .audit import required_part
+from .classify import ChangeSummary, RootTrie, classify_trees
+from .core import TDVer
+from .memo import ResultCache
+from .nearest import nearest_tags
+from .results import HistoryIncomplete, TDVerError
+from .tags import TagCache
+
+CONFIG = "tdver.json"
+
+
+def discover(repo):
+    """
+    Directories ("" for the top) with a tdver.json committed at HEAD,
+    sorted. Read from HEAD's tree rather than the index, which is empty
+    in a bare clone.
+    """
+    try:
+        tree = repo.head.peel(pygit2.Tree)
+    except pygit2.GitError:  # unborn branch
+        return []
+    found = []
+    trees = [("", tree)]
+    while trees:
+        path, tree = trees.pop()
+        for entry in tree:
+            if entry.type_str == "tree":
+                trees.append((path + entry.name + "/", repo[entry.id]))
+            elif entry.name == CONFIG and entry.type_str == "blob":
+                found.append(path.rstrip("/"))
+    return sorted(found)
+
+
+class Workspace(object):
+    """
+    Every package in one repository: a directory with its own tdver.json,
+    test roots relative to that directory, and its own tag prefix ("" at
+    the top, "<dir>/" below it unless the package sets tag_prefix).
+
+    check() shares the expensive parts between packages: one reference
+    scan partitions the tags by prefix, one ancestor walk finds every
+    package's last release, one diff per distinct release commit
+    classifies every package released there, and a clean worktree is
+    established once for all of them.
+    """
+
+    def __init__(self, repo, tag_cache=None, config=None):
+        self.repo = repo
+        self.tag_cache = tag_cache or TagCache(repo, TDVer.parse_tag)
+        self.overrides = dict(config or {})  # layered over every package's config
+        self.result_cache = ResultCache(
+            repo, self.overrides.get("result_cache_size", ResultCache.SIZE)
+        )
+
+    def load_config(self, path):
+        """
+        The package's tdver.json from disk, or as committed at HEAD when it
+        isn't on disk (bare clones, and packages a sparse checkout left out).
+        """
+        config = None
+        if self.repo.workdir:
+            name = os.path.join(self.repo.workdir, path, CONFIG)
+            try:
+                with open(name, "r") as conf:
+                    try:
+                        config = json.load(conf)
+                    except ValueError as e:
+                        raise TDVerError("%s isn't valid JSON: %s" % (name, e)) from e
+            except FileNotFoundError:
+                pass
+        if config is None:
+            config = self.repo.committed_config(path)
+        if config is None:  # its blob wasn't fetched into this partial clone
+            name = path + "/" + CONFIG if path else CONFIG
+            raise TDVerError("TDVer couldn't read %s at HEAD" % name)
+        config.update(self.overrides)
+        return config
+
+    @cached_property
+    def packages(self):
+        """{path: TDVer} for every package with a tdver.json committed at HEAD."""
+        found = {}
+        for path in discover(self.repo):
+            tdver = TDVer(
+                self.load_config(path),
+                repo=self.repo,
+                tag_cache=self.tag_cache,
+                path=path,
+            )
+            tdver.result_cache = self.result_cache
+            found[path] = tdver
+        return found
+
+    @cached_property
+    def clashes(self):
+        """
+        {path: TDVerError} for packages sharing a tag prefix with another,
+        which would otherwise silently read (and release into) each
+        other's tags.
+        """
+        users = {}
+        for path, tdver in self.packages.items():
+            try:
+                users.setdefault(tdver.prefix, []).append(path)
+            except TDVerError:
+                continue  # misconfigured; check() reports it
+        found = {}
+        for prefix, paths in users.items():
+            if len(paths) < 2:
+                continue
+            for path in paths:
+                others = ", ".join(other or "." for other in paths if other != path)
+                found[path] = TDVerError(
+                    "tag_prefix %r is also used by %s; give each package its own"
+                    " tag_prefix in its tdver.json" % (prefix, others)
+                )
+        return found
+
+    def find_versions(self):
+        """Settle every package's last release with one walk from HEAD."""
+        packages = []
+        for path, tdver in self.packages.items():
+            if path in self.clashes:
+                continue
+            try:
+                tdver.prefix  # pylint: disable=pointless-statement
+            except TDVerError:
+                continue  # misconfigured; check() reports it
+            packages.append(tdver)
+        if not packages:
+            return
+        grouped = self.tag_cache.tagged_by_prefix()
+        tagged = {tdver.prefix: grouped.get(tdver.prefix, {}) for tdver in packages}
+        with self.repo.walking() as graph:
+            found = nearest_tags(
+                self.repo,
+                str(self.repo.head.target),
+                tagged,
+                limit=max(tdver.walk_limit for tdver in packages),
+                graph=graph,
+            )
+        for tdver in packages:
+            # packages with no release are left to fail on their own in check()
+            if found[tdver.prefix] is not None:
+                tdver.nearest = found[tdver.prefix]
+
+    def find_changes(self):
+        """
+        Classify last_tag..HEAD for every package, diffing once for each
+        distinct release commit with all of its packages' roots at once
+        (packages with different diff budgets get separate diffs).
+        """
+        groups = {}  # (release commit, budget) -> [(path, TDVer, result cache key)]
+        head = self.repo.head.target
+        partial = "partial" in self.repo.incomplete()
+        for path, tdver in self.packages.items():
+            if "nearest" not in vars(tdver):
+                continue
+            try:
+                budget = tdver.diff_budget
+            except TDVerError:
+                continue  # misconfigured; check() reports it
+            key = ResultCache.key(tdver.nearest.commit, head, tdver.roots, budget)
+            found = self.result_cache.get(key)
+            if found is not None:
+                tdver.committed = found
+            else:
+                group = (tdver.nearest.commit, tuple(budget.key()))
+                groups.setdefault(group, []).append((path, tdver, key))
+        for members in groups.values():
+            roots = {}
+            for path, tdver, _ in members:
+                for name, patterns in tdver.roots.items():
+                    roots[(path, name)] = patterns
+            first = members[0][1]
+            try:
+                with profile.phase("diff"):
+                    summary = classify_trees(
+                        self.repo,
+                        first.tag_tree,
+                        first.head_tree,
+                        RootTrie(roots),
+                        ChangeSummary(roots),
+                        partial,
+                        first.diff_budget,
+                    )
+            except HistoryIncomplete:
+                continue  # as below: each package's check() reports it
+            for path, tdver, key in members:
+                own = ChangeSummary(tdver.ROOTS)
+                for name in tdver.ROOTS:
+                    own.roots[name] = list(summary.roots[(path, name)])
+                    if (path, name) in summary.missing:
+                        own.missing[name] = summary.missing[(path, name)]
+                own.files_changed = summary.files_changed
+                try:
+                    part = required_part(own, tdver.tree_changed())
+                except HistoryIncomplete:
+                    continue  # check() raises it again, for this package alone
+                tdver.committed = (own, part)
+                if not own.missing:
+                    self.result_cache.put(key, *tdver.committed, save=False)
+        if groups:
+            self.result_cache.save()
+
+    def find_dirty(self):
+        """When the whole worktree is clean, so is every package in it."""
+        waiting = [
+            tdver
+            for tdver in self.packages.values()
+            if "committed" in vars(tdver) and tdver.committed[1] is None
+        ]
+        if len(waiting) > 1 and not self.repo.dirty():
+            for tdver in waiting:
+                tdver.dirty = False
+
+    def check(self):
+        """
+        Return [(path, CheckResult)] for every package, in path order; a
+        package that can't be evaluated gets its TDVerError instead.
+        Raises TDVerError when there are no packages at all, rather than
+        passing with nothing checked.
+        """
+        if not self.packages:
+            raise TDVerError("TDVer found no tdver.json committed at HEAD.")
+        with profile.phase("workspace"):
+            self.find_versions()
+            self.find_changes()
+            self.find_dirty()
+        results = []
+        for path, tdver in self.packages.items():
+            if path in self.clashes:
+                results.append((path, self.clashes[path]))
+                continue
+            try:
+                results.append((path, tdver.check()))
+            except TDVerError as e:
+                results.append((path, e))
+        return results
@@ -0,0 +1,200 @@
+"""Early-exit dirty check: HEAD vs index, then index stat data vs the worktree"""
+import os
+import glob
+import stat
+import struct
+import pygit2
+from . import profile
+
+ENTRY = struct.Struct(">10I")  # ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+EXTENDED = 0x4000
+STAGE = 0x3000
+NAME_MASK = 0x0FFF
+SKIP_WORKTREE = 0x4000  # in the second (extended) flags word
+INTENT_TO_ADD = 0x2000
+GITLINK = 0o160000
+
+WORKTREE_CHANGED = (
+    pygit2.GIT_STATUS_WT_MODIFIED
+    | pygit2.GIT_STATUS_WT_DELETED
+    | pygit2.GIT_STATUS_WT_TYPECHANGE
+    | pygit2.GIT_STATUS_CONFLICTED
+)
+
+
+class UnsupportedIndex(Exception):
+    pass
+
+
+def config_value(repo, key, default=None):
+    try:
+        return repo.config[key]
+    except KeyError:
+        return default
+
+
+def config_bool(repo, key, default):
+    """A boolean setting as git reads it: a bare key is true; unset is default."""
+    try:
+        return repo.config.get_bool(key)
+    except (KeyError, pygit2.GitError):  # unset, or not a boolean at all
+        return default
+
+
+def read_varint(data, pos):
+    """git's offset varint, as used for v4 path prefix compression."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def index_entries(data, hash_size=20):
+    """
+    Yield (path, mtime_s, mtime_ns, ino, mode, size, flags, extended_flags)
+    for each entry of a v2/v3/v4 index file, without reading past the
+    entries we're asked for.
+    """
+    if data[:4] != b"DIRC":
+        raise UnsupportedIndex("not an index file")
+    version, count = struct.unpack_from(">2I", data, 4)
+    if version not in (2, 3, 4):
+        raise UnsupportedIndex("index version %d" % version)
+    pos = 12
+    path = b""
+    fixed = ENTRY.size + hash_size + 2
+    for _ in range(count):
+        start = pos
+        fields = ENTRY.unpack_from(data, pos)
+        pos += ENTRY.size + hash_size
+        (flags,) = struct.unpack_from(">H", data, pos)
+        pos += 2
+        extended = 0
+        if flags & EXTENDED:
+            (extended,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+        if version == 4:
+            strip, pos = read_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = path[: len(path) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            length = flags & NAME_MASK
+            if length == NAME_MASK:
+                length = data.index(b"\0", pos) - pos
+            path = data[pos : pos + length]
+            # entries are NUL-padded to a multiple of eight bytes
+            pos = start + ((fixed + (2 if flags & EXTENDED else 0) + length + 8) & ~7)
+        yield (
+            path.decode("utf-8", "surrogateescape"),
+            fields[2],
+            fields[3],
+            fields[5],
+            fields[6],
+            fields[9],
+            flags,
+            extended,
+        )
+
+
+def index_dirty(repo, trie=None):
+    """Has anything been staged relative to HEAD (optionally only under trie)?"""
+    try:
+        head = repo.head.peel(pygit2.Tree)
+    except pygit2.GitError:
+        return len(repo.index) > 0  # unborn branch; anything staged is a change
+    repo.index.read(False)  # pick up changes since a long-lived repo last looked
+    diff = repo.index.diff_to_tree(head)
+    for delta in diff.deltas:
+        if trie is None or trie.match(delta.new_file.path) or trie.match(
+            delta.old_file.path
+        ):
+            return True
+    return False
+
+
+def worktree_dirty(repo, trie=None):
+    """
+    Walk the index comparing each entry's cached stat data to an lstat of
+    the worktree file, returning at the first real modification.
+
+    Entries whose stat data differs but whose size doesn't (or which are
+    racily clean, i.e. modified in the same tick the index was written)
+    are confirmed with libgit2's status check for just that path, so
+    touch-only changes and content filters don't cause false positives.
+    Untracked files are never looked at.
+    """
+    index_path = os.path.join(repo.path, "index")
+    if glob.glob(os.path.join(repo.path, "sharedindex.*")):
+        raise UnsupportedIndex("split index")
+    try:
+        with open(index_path, "rb") as f:
+            data = f.read()
+        index_mtime = os.stat(index_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    filemode = config_bool(repo, "core.filemode", True)
+    hash_size = 32 if config_value(repo, "extensions.objectformat") == "sha256" else 20
+    workdir = repo.workdir
+    lstat = os.lstat
+    checked = 0
+    try:
+        for path, mtime_s, mtime_ns, ino, mode, size, flags, extended in index_entries(
+            data, hash_size
+        ):
+            if trie is not None and not trie.match(path):
+                continue
+            checked += 1
+            if flags & STAGE or extended & INTENT_TO_ADD:
+                return True
+            if extended & SKIP_WORKTREE or mode == GITLINK:
+                continue
+            try:
+                info = lstat(workdir + path)
+            except (FileNotFoundError, NotADirectoryError):
+                return True
+            st_mode = info.st_mode
+            if (
+                info.st_size & 0xFFFFFFFF != size
+                or stat.S_ISLNK(mode) != stat.S_ISLNK(st_mode)
+                or not (stat.S_ISLNK(st_mode) or stat.S_ISREG(st_mode))
+                or filemode
+                and (mode ^ st_mode) & 0o100
+                and not stat.S_ISLNK(mode)
+            ):
+                return True
+            st_mtime = info.st_mtime_ns
+            if (
+                st_mtime // 1000000000 != mtime_s
+                or mtime_ns
+                and st_mtime % 1000000000 != mtime_ns
+                or info.st_ino & 0xFFFFFFFF != ino
+                or mtime_s * 1000000000 + mtime_ns >= index_mtime
+            ):
+                profile.count("verified")
+                if repo.status_file(path) & WORKTREE_CHANGED:
+                    return True
+        return False
+    finally:
+        profile.count("entries", checked)
+
+
+def dirty(repo, trie=None):
+    """True if tracked content (optionally only under trie) differs from HEAD."""
+    if repo.is_bare:
+        return False  # no index or worktree to differ
+    if index_dirty(repo, trie):
+        return True
+    try:
+        return worktree_dirty(repo, trie)
+    except UnsupportedIndex:
+        status = repo.status(untracked_files="no")
+        return any(
+            flags & ~pygit2.GIT_STATUS_IGNORED
+            for path, flags in status.items()
+            if trie is None or trie.match(path)
+        )
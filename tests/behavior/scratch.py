@@ -0,0 +1,89 @@
+"""Throwaway git repositories for the behavior tests, built with git itself"""
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+
+# fixed identity and dates, so nothing depends on the user's git config
+ENV = {
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_AUTHOR_DATE": "1700000000 +0000",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+    "GIT_COMMITTER_DATE": "1700000000 +0000",
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "HOME": os.devnull,
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def tdver(cwd, *args, env=None):
+    """Run the tdver CLI (never via a daemon) in cwd; returns the finished process."""
+    environ = dict(os.environ, PYTHONPATH=ROOT, TDVER_NO_DAEMON="1", **ENV)
+    environ.update(env or {})
+    return subprocess.run(
+        [sys.executable, "-c", "import tdver; tdver.main()"] + list(args),
+        cwd=cwd,
+        env=environ,
+        capture_output=True,
+        text=True,
+    )
+
+
+def counters(call):
+    """call()'s result, and the profile counters it bumped in every phase."""
+    from tdver import profile  # pylint: disable=import-outside-toplevel
+
+    profiler = profile.Profiler()
+    with mock.patch.object(profile, "ACTIVE", profiler):
+        with profiler.phase("test"):
+            result = call()
+    found = {}
+    for record in profiler.phases:
+        for key, value in record.counters.items():
+            found[key] = found.get(key, 0) + value
+    return result, found
+
+
+class Scratch(object):
+    """A fresh repository in a temporary directory; remove() deletes it."""
+
+    def __init__(self, object_format="sha1"):
+        self.path = tempfile.mkdtemp(prefix="tdver-test-")
+        self.git("init", "-q", "-b", "main", "--object-format=" + object_format)
+
+    def git(self, *args, stdin=None, env=None):
+        """Run git in the repository and return its stdout."""
+        return subprocess.run(
+            ("git",) + args,
+            cwd=self.path,
+            env=dict(os.environ, **dict(ENV, **(env or {}))),
+            input=stdin,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+
+    def write(self, name, text):
+        path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def commit(self, message, *names, date=None):
+        """
+        Add names (default: everything) and commit, at date ("<epoch> <tz>")
+        if given; returns the commit's hex OID.
+        """
+        env = {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date} if date else None
+        self.git("add", *(names or ("-A",)))
+        self.git("commit", "-q", "--allow-empty", "-m", message, env=env)
+        return self.git("rev-parse", "HEAD").strip()
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
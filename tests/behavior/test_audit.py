@@ -0,0 +1,88 @@
+"""tdver audit over a release history built with git"""
+import os
+import sys
+import json
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, counters, tdver  # noqa: E402
+from tdver.core import Repo, TDVer  # noqa: E402
+from tdver.results import TDVerError  # noqa: E402
+
+# (files written, tag, the part its changes call for, ok)
+HISTORY = [
+    ({"tests/t.txt": "a\n", "bugs/b.txt": "", "src/s.txt": ""}, "0.1.0", None, True),
+    ({"tests/t.txt": "a\nb\n"}, "0.2.0", "b", True),
+    ({"bugs/b.txt": "1\n"}, "0.2.1", "c", True),
+    ({"tests/t.txt": "a\nB\n"}, "0.2.2", "a", False),  # should have been 1.0.0
+    ({"src/s.txt": "s\n"}, "0.2.2-1", "d", True),
+]
+
+
+class Audit(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        for files, tag, _, _ in HISTORY:
+            for path, text in files.items():
+                self.scratch.write(path, text)
+            self.scratch.commit(tag)
+            self.scratch.write("src/untagged.txt", tag)
+            self.scratch.commit("after " + tag)  # releases needn't be adjacent
+            self.scratch.git("tag", tag, "HEAD^")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def audit(self, *args):
+        found = tdver(self.scratch.path, "audit", *args)
+        verdicts = [json.loads(line) for line in found.stdout.splitlines()]
+        return found.returncode, verdicts
+
+    def test_every_release(self):
+        status, verdicts = self.audit()
+        self.assertEqual(status, 1)  # 0.2.2 broke the rules
+        self.assertEqual([v["tag"] for v in verdicts], [h[1] for h in HISTORY])
+        for verdict, (_, tag, part, ok) in zip(verdicts, HISTORY):
+            self.assertEqual(verdict["part"], part, tag)
+            self.assertEqual(verdict["ok"], ok, tag)
+            if verdict["previous_tag"] is None:
+                continue
+            # the release before it, as git describe sees it from its parent
+            described = self.scratch.git("describe", "--tags", "--abbrev=0", tag + "^")
+            self.assertEqual(verdict["previous_tag"], described.strip(), tag)
+            self.assertEqual(verdict["distance"], 2, tag)
+        self.assertEqual(verdicts[3]["required"], "1.0.0")
+        self.assertEqual(verdicts[3]["changes"]["tests"], [1, 1])
+
+    def test_range(self):
+        status, verdicts = self.audit("0.2.1..HEAD")
+        self.assertEqual(status, 1)
+        self.assertEqual([v["tag"] for v in verdicts], ["0.2.2", "0.2.2-1"])
+        self.assertEqual(verdicts[0]["previous_tag"], "0.2.1")  # outside the range
+        status, verdicts = self.audit("0.2.2..HEAD")
+        self.assertEqual((status, [v["tag"] for v in verdicts]), (0, ["0.2.2-1"]))
+
+    def test_one_pass(self):
+        repo = Repo(self.scratch.path)
+        audit = TDVer(None, repo=repo, path="").audit
+        found, counted = counters(lambda: list(audit("HEAD")))
+        self.assertEqual(len(found), len(HISTORY))
+        commits = int(self.scratch.git("rev-list", "--count", "HEAD"))
+        self.assertEqual(counted["commits"], commits)  # each walked once
+        self.assertNotIn("outside_range", counted)
+        _, counted = counters(lambda: list(audit("0.2.1..HEAD")))
+        self.assertEqual(counted["outside_range"], 1)  # 0.2.1's child, looked up once
+
+    def test_bad_range(self):
+        audit = TDVer(None, repo=Repo(self.scratch.path), path="").audit
+        with self.assertRaises(TDVerError):
+            list(audit("nope..HEAD"))
+
+
+if __name__ == "__main__":
+    unittest.main()
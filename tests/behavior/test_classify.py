@@ -0,0 +1,271 @@
+"""Counting changed test lines: DiffBudget and the diff classifier"""
+import os
+import sys
+import unittest
+import pygit2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, counters  # noqa: E402
+from tdver.classify import (  # noqa: E402
+    ChangeSummary,
+    DiffBudget,
+    LineCounter,
+    RootTrie,
+    classify,
+    classify_trees,
+)
+from tdver.core import Repo, TDVer  # noqa: E402
+from tdver.results import TDVerError  # noqa: E402
+
+
+ROOTS = {"tests": ["tests/", "pkgs/*/tests/"], "bug_tests": "bugs/"}
+
+
+def numstat(scratch, old, new, *paths):
+    """(insertions, deletions) git counts between old and new under paths."""
+    insertions = deletions = 0
+    found = scratch.git("diff", "--numstat", "--no-renames", old, new, "--", *paths)
+    for line in found.splitlines():
+        added, removed, _ = line.split("\t", 2)
+        if added != "-":  # binary
+            insertions += int(added)
+            deletions += int(removed)
+    return insertions, deletions
+
+
+class Trie(unittest.TestCase):
+    def test_prefixes(self):
+        trie = RootTrie({"tests": "tests/", "bug_tests": ["bugs/", "tests/bugs/"]})
+        self.assertEqual(trie.match("tests/a.py"), {"tests"})
+        self.assertEqual(trie.match("tests/bugs/1.py"), {"tests", "bug_tests"})
+        self.assertEqual(trie.match("bugs/1.py"), {"bug_tests"})
+        self.assertEqual(trie.match("src/tests/a.py"), set())
+        self.assertEqual(trie.match("tests"), set())  # the directory itself
+
+    def test_globs(self):
+        trie = RootTrie(ROOTS)
+        self.assertEqual(trie.match("pkgs/a/tests/t.py"), {"tests"})
+        self.assertEqual(trie.match("pkgs/a/tests/deep/t.py"), {"tests"})
+        self.assertEqual(trie.match("pkgs/a/src/t.py"), set())
+        self.assertEqual(trie.match("pkgs/tests/t.py"), set())
+        trie = RootTrie({"tests": "test_*.py"})
+        self.assertEqual(trie.match("test_core.py"), {"tests"})
+        self.assertEqual(trie.match("core.py"), set())
+
+    def test_empty(self):
+        self.assertFalse(RootTrie({"tests": None, "bug_tests": []}))
+        self.assertEqual(RootTrie({}).match("tests/a"), set())
+
+
+class Classify(unittest.TestCase):
+    """Every root counted in one pass, as git counts each on its own."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        files = {
+            "tests/a.txt": "1\n2\n3\n",
+            "tests/unit/b.txt": "1\n",
+            "bugs/c.txt": "1\n",
+            "pkgs/x/tests/d.txt": "1\n2\n",
+            "pkgs/x/src/e.txt": "1\n",
+            "src/f.txt": "1\n",
+        }
+        for path, text in files.items():
+            self.scratch.write(path, text)
+        self.old = self.scratch.commit("initial")
+        self.scratch.write("tests/a.txt", "1\nTWO\n3\n4\n")
+        self.scratch.write("tests/unit/new.txt", "1\n2\n")
+        self.scratch.git("rm", "-q", "tests/unit/b.txt")
+        self.scratch.write("bugs/c.txt", "1\n2\n")
+        self.scratch.write("pkgs/x/tests/d.txt", "2\n")
+        self.scratch.write("pkgs/x/src/e.txt", "1\n2\n3\n")
+        self.scratch.write("src/f.txt", "")
+        self.new = self.scratch.commit("changes")
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def tree(self, commit):
+        return self.repo[commit].peel(pygit2.Tree)
+
+    def expected(self):
+        return {
+            "tests": numstat(self.scratch, self.old, self.new, "tests", "pkgs/x/tests"),
+            "bug_tests": numstat(self.scratch, self.old, self.new, "bugs"),
+        }
+
+    def test_one_pass_matches_git(self):
+        diff = self.repo.diff(self.tree(self.old), self.tree(self.new))
+        summary = classify(diff, ROOTS)
+        for name, counts in self.expected().items():
+            self.assertEqual(summary[name], counts, name)
+        files = self.scratch.git(
+            "diff", "--name-only", "--no-renames", self.old, self.new
+        )
+        self.assertEqual(summary.files_changed, len(files.split()))
+
+    def test_trees_match_git(self):
+        summary = classify_trees(
+            self.repo, self.tree(self.old), self.tree(self.new), ROOTS
+        )
+        for name, counts in self.expected().items():
+            self.assertEqual(summary[name], counts, name)
+
+    def test_rename_counts_for_both_roots(self):
+        self.scratch.git("mv", "bugs/c.txt", "tests/c.txt")
+        new = self.scratch.commit("promote a bug test")
+        diff = self.repo.diff(self.tree(self.new), self.tree(new))
+        diff.find_similar()
+        summary = classify(diff, ROOTS, ChangeSummary(ROOTS))
+        self.assertEqual(summary["tests"], (0, 0))
+        self.assertEqual(summary["bug_tests"], (0, 0))
+        self.assertEqual(summary.files_changed, 1)
+
+
+class Subtrees(unittest.TestCase):
+    """classify_trees() only diffs the directories holding roots that changed."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        for path in ("tests/a.txt", "bugs/b.txt", "src/c.txt", "pkgs/x/tests/d.txt"):
+            self.scratch.write(path, "1\n")
+        self.old = self.scratch.commit("initial")
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def classify(self, new, roots=None):
+        old, new = (self.repo[c].peel(pygit2.Tree) for c in (self.old, new))
+        return counters(lambda: classify_trees(self.repo, old, new, roots or ROOTS))
+
+    def test_outermost_directories(self):
+        self.assertEqual(RootTrie(ROOTS).subtrees(), ["bugs", "pkgs", "tests"])
+        nested = {"tests": "tests/", "bug_tests": "tests/bugs/"}
+        self.assertEqual(RootTrie(nested).subtrees(), ["tests"])
+        # these could match at the top level, so only a full diff is safe
+        self.assertIsNone(RootTrie({"tests": "tests"}).subtrees())
+        self.assertIsNone(RootTrie({"tests": "test_*.py"}).subtrees())
+
+    def test_unchanged_roots_are_not_diffed(self):
+        self.scratch.write("src/c.txt", "1\n2\n")
+        summary, counted = self.classify(self.scratch.commit("src only"))
+        self.assertEqual(counted.get("deltas", 0), 0)
+        self.assertEqual(summary.files_changed, 0)
+        self.assertEqual(summary["tests"], (0, 0))
+
+    def test_same_tree(self):
+        summary, counted = self.classify(self.old)
+        self.assertNotIn("subtrees", counted)
+        self.assertEqual(summary.files_changed, 0)
+
+    def test_same_counts_as_a_full_diff(self):
+        self.scratch.write("src/c.txt", "1\n2\n")
+        self.scratch.write("tests/a.txt", "2\n3\n")
+        self.scratch.write("pkgs/x/tests/d.txt", "1\n2\n")
+        new = self.scratch.commit("tests too")
+        summary, counted = self.classify(new)
+        self.assertEqual(counted["deltas"], 2)  # not src/c.txt
+        diff = self.repo.diff(self.old, new)
+        self.assertEqual(summary.roots, classify(diff, ROOTS).roots)
+
+    def test_a_root_that_was_added(self):
+        self.scratch.write("spec/s.txt", "1\n2\n")
+        summary, _ = self.classify(self.scratch.commit("spec"), {"tests": "spec/"})
+        self.assertEqual(summary["tests"], (2, 0))
+
+
+class Budget(unittest.TestCase):
+    BIG = "".join("line %d\n" % i for i in range(100))  # 790 bytes
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tests/big.txt", self.BIG)
+        self.scratch.write("tests/gone.txt", self.BIG)
+        self.scratch.write("tests/small.txt", "a\n")
+        self.scratch.write("tests/image.bin", "\0\1\2")
+        self.old = self.scratch.commit("initial")
+        self.scratch.write("tests/big.txt", self.BIG + "more\n")
+        self.scratch.git("rm", "-q", "tests/gone.txt")
+        self.scratch.write("tests/new.txt", self.BIG)
+        self.scratch.write("tests/small.txt", "a\nb\nc\n")
+        self.scratch.write("tests/image.bin", "\0\1\2\3")
+        self.scratch.write("tests/new.bin", "\0")
+        self.new = self.scratch.commit("changes")
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def count(self, *paths, **budget):
+        """Count the changes to paths (default: all) as "tests", within budget."""
+        old, new = (self.repo[c].peel(pygit2.Tree) for c in (self.old, self.new))
+        counter = LineCounter(self.repo.odb, budget=DiffBudget(**budget))
+        roots = {"tests": list(paths) or "tests/"}
+        diff = self.repo.diff(old, new)
+        return counters(lambda: classify(diff, roots, counter=counter))
+
+    def test_oversized_files_count_by_status(self):
+        expected = {  # modified, deleted, added
+            "tests/big.txt": (1, 1),
+            "tests/gone.txt": (0, 1),
+            "tests/new.txt": (1, 0),
+        }
+        for path, counts in expected.items():
+            summary, counted = self.count(path, size_limit=100)
+            self.assertEqual(summary["tests"], counts, path)
+            self.assertEqual(counted["by_status"], 1, path)
+            self.assertNotIn("blob_bytes", counted)  # never loaded
+            summary, _ = self.count(path, size_limit=0)  # no limit
+            self.assertEqual(
+                summary["tests"], numstat(self.scratch, self.old, self.new, path)
+            )
+        summary, counted = self.count("tests/small.txt", size_limit=100)
+        self.assertEqual(summary["tests"], (2, 0))
+        self.assertNotIn("by_status", counted)
+
+    def test_binary_files(self):
+        summary, counted = self.count("tests/image.bin", "tests/new.bin")
+        self.assertEqual((summary["tests"], counted["binary"]), ((0, 0), 2))
+        summary, _ = self.count("tests/image.bin", binary="status")
+        self.assertEqual(summary["tests"], (1, 1))
+        summary, _ = self.count("tests/new.bin", binary="status")
+        self.assertEqual(summary["tests"], (1, 0))
+        summary, _ = self.count()  # files_changed counts them all the same
+        self.assertEqual(summary.files_changed, 6)
+
+    def test_check_uses_the_budget(self):
+        config = {"diff_size_limit": 100, "binary_files": "status"}
+        self.scratch.git("tag", "0.1.0", self.old)
+        tdver = TDVer(config, repo=Repo(self.scratch.path), path="")
+        # small 2 added; big, gone and new by status; image modified, new.bin added
+        self.assertEqual(tdver.summary["tests"], (2 + 1 + 0 + 1 + 1 + 1, 1 + 1 + 1))
+        self.assertEqual(tdver.check().part_name, "a")
+
+    def test_size_limit(self):
+        self.assertEqual(DiffBudget.from_config({}).size_limit, DiffBudget.SIZE_LIMIT)
+        self.assertEqual(DiffBudget.from_config({"diff_size_limit": 0}).size_limit, 0)
+        for bad in ("8M", -1, 1.5, True, None):
+            with self.assertRaises(TDVerError) as raised:
+                DiffBudget.from_config({"diff_size_limit": bad})
+            self.assertIn("diff_size_limit", str(raised.exception))
+
+    def test_binary_files_setting(self):
+        with self.assertRaises(TDVerError):
+            DiffBudget.from_config({"binary_files": "count"})
+
+    def test_check_reports_a_bad_limit(self):
+        self.scratch.git("tag", "0.1.0", self.old)
+        config = {"diff_size_limit": "8M"}
+        tdver = TDVer(config, repo=Repo(self.scratch.path), path="")
+        with self.assertRaises(TDVerError):
+            tdver.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""The command line itself: options and environment, outside any one subcommand"""
+import os
+import sys
+import shutil
+import subprocess
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import ENV, ROOT, Scratch, tdver  # noqa: E402
+
+# what the CLI imported, once it's done; sys.exit() is how it returns
+IMPORTED = """
+import sys, tdver
+try:
+    tdver.main(sys.argv[1:])
+except SystemExit:
+    pass
+print(" ".join(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+class Profile(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def test_without_a_subcommand(self):
+        for args, env in ((["--profile"], None), ([], {"TDVER_PROFILE": "1"})):
+            found = tdver(self.scratch.path, *args, env=env)
+            self.assertEqual(found.returncode, 0, found.stderr)
+            self.assertNotIn("Traceback", found.stderr)
+            self.assertIn("tdver", found.stderr.splitlines()[1])
+
+    def test_env_off(self):
+        for value in ("0", "false", "no", "off", ""):
+            found = tdver(self.scratch.path, "check", env={"TDVER_PROFILE": value})
+            self.assertEqual(found.returncode, 0, found.stderr)
+            self.assertNotIn("wall ms", found.stderr, value)
+        found = tdver(self.scratch.path, "check", env={"TDVER_PROFILE": "yes"})
+        self.assertIn("wall ms", found.stderr)
+
+
+class Unconfigured(unittest.TestCase):
+    """No tdver.json on disk: maybe one at HEAD, looked up only when needed."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+        self.bare = self.scratch.path + ".bare"
+        self.scratch.git("clone", "-q", "--bare", self.scratch.path, self.bare)
+
+    def tearDown(self):
+        shutil.rmtree(self.bare, ignore_errors=True)
+        self.scratch.remove()
+
+    def imported(self, cwd, *args):
+        found = subprocess.run(
+            [sys.executable, "-c", IMPORTED] + list(args),
+            cwd=cwd,
+            env=dict(os.environ, PYTHONPATH=ROOT, TDVER_NO_DAEMON="1", **ENV),
+            capture_output=True,
+            text=True,
+        )
+        return found.stderr.splitlines()[-1].split()
+
+    def test_help_and_version_leave_the_repository_alone(self):
+        for args in (["--help"], ["--version"], ["check", "--help"]):
+            self.assertNotIn("pygit2", self.imported(self.bare, *args), args)
+        self.assertIn("pygit2", self.imported(self.bare, "check"))
+
+    def test_bare(self):
+        found = tdver(self.bare, "--help")
+        for command in ("check", "release", "start"):
+            self.assertIn(command, found.stdout)
+        found = tdver(self.bare, "check")
+        self.assertEqual(found.returncode, 0, found.stderr)
+        self.assertEqual(found.stdout, "0.1.0\n")
+
+    def test_no_tdver_json_anywhere(self):
+        empty = Scratch()
+        self.addCleanup(empty.remove)
+        empty.commit("initial")
+        found = tdver(empty.path, "check")
+        self.assertNotEqual(found.returncode, 0)
+        self.assertIn("tdver start", found.stderr)
+        self.assertNotIn("Traceback", found.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Repo.incomplete() for the shallow and partial clones git makes"""
+import os
+import sys
+import shutil
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch  # noqa: E402
+from tdver.core import Repo  # noqa: E402
+
+
+class Incomplete(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        for n in range(3):
+            self.scratch.write("tests/t.txt", "%d\n" % n)
+            self.scratch.commit("commit %d" % n)
+        self.scratch.git("config", "uploadpack.allowFilter", "true")
+        self.clone = self.scratch.path + ".clone"
+
+    def tearDown(self):
+        shutil.rmtree(self.clone, ignore_errors=True)
+        self.scratch.remove()
+
+    def cloned(self, *args):
+        url = "file://" + self.scratch.path
+        self.scratch.git("clone", "-q", *(args + (url, self.clone)))
+        return Repo(self.clone)
+
+    def configure(self, text):
+        with open(os.path.join(self.clone, ".git", "config"), "a") as f:
+            f.write(text)
+        return Repo(self.clone)
+
+    def test_complete(self):
+        self.assertEqual(self.cloned().incomplete(), ())
+
+    def test_shallow(self):
+        self.assertEqual(self.cloned("--depth", "1").incomplete(), ("shallow",))
+
+    def test_partial(self):
+        repo = self.cloned("--filter=blob:none")
+        self.assertEqual(repo.incomplete(), ("partial",))
+
+    def test_promisor_without_a_value(self):
+        self.cloned()
+        repo = self.configure('[remote "origin"]\n\tpromisor\n')
+        self.assertEqual(repo.incomplete(), ("partial",))
+
+    def test_promisor_false(self):
+        self.cloned()
+        repo = self.configure('[remote "origin"]\n\tpromisor = false\n')
+        self.assertEqual(repo.incomplete(), ())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""tdver fleet over a mix of repositories, including ones that fail or hang"""
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, tdver  # noqa: E402
+from tdver import fleet  # noqa: E402
+
+
+def released(needs_release=False):
+    """A tdver repository whose HEAD is (or, with needs_release, isn't) released."""
+    scratch = Scratch()
+    scratch.write("tdver.json", '{"version": "0.1.0"}')
+    scratch.write("tests/t.txt", "a\n")
+    scratch.commit("initial")
+    scratch.git("tag", "0.1.0")
+    if needs_release:
+        scratch.write("tests/t.txt", "a\nb\n")
+        scratch.commit("add a test")
+    return scratch
+
+
+def hang(path, check_all=False):  # pylint: disable=unused-argument
+    time.sleep(60)
+
+
+def crash(path, check_all=False):  # pylint: disable=unused-argument
+    os._exit(3)  # pylint: disable=protected-access
+
+
+class Fleet(unittest.TestCase):
+    def setUp(self):
+        self.good = released()
+        self.behind = released(needs_release=True)
+        self.plain = Scratch()  # a git repository, but not a tdver one
+        self.plain.write("README", "hi\n")
+        self.plain.commit("initial")
+        self.missing = os.path.join(self.plain.path, "nowhere")
+        for scratch in (self.good, self.behind, self.plain):
+            self.addCleanup(scratch.remove)
+
+    def sweep(self, paths, **kwargs):
+        return {result["path"]: result for result in fleet.sweep(paths, 2, **kwargs)}
+
+    def test_sweep(self):
+        paths = [self.good.path, self.behind.path, self.plain.path, self.missing]
+        found = self.sweep(paths)
+        self.assertEqual(set(found), set(paths))
+        self.assertTrue(found[self.good.path]["ok"])
+        self.assertFalse(found[self.behind.path]["ok"])
+        self.assertEqual(found[self.behind.path]["part"], "b")
+        self.assertEqual(found[self.plain.path]["error"], "not a tdver repository")
+        self.assertIn("error", found[self.missing])
+        summary = fleet.Summary()
+        for result in found.values():
+            summary.add(result)
+        counts = summary.as_dict()
+        del counts["seconds"]
+        self.assertEqual(
+            counts, {"total": 4, "ok": 1, "failed": 1, "errors": 2, "timeouts": 0}
+        )
+
+    def test_check_all(self):
+        self.good.write("pkgs/a/tdver.json", '{"version": "0.1.0"}')
+        self.good.commit("add a package")
+        found = self.sweep([self.good.path], check_all=True)[self.good.path]
+        self.assertEqual(set(found["packages"]), {"", "pkgs/a"})
+        self.assertFalse(found["ok"])  # the new commit isn't released
+
+    def test_hung_and_crashed_workers(self):
+        with mock.patch.object(fleet, "evaluate", hang):
+            started = time.monotonic()
+            found = self.sweep([self.good.path, self.behind.path], timeout=0.3)
+            self.assertLess(time.monotonic() - started, 10)
+        self.assertTrue(all(result["timeout"] for result in found.values()))
+        with mock.patch.object(fleet, "evaluate", crash):
+            found = self.sweep([self.good.path])
+        self.assertEqual(found[self.good.path]["error"], "worker exited with status 3")
+
+    def test_cli(self):
+        listing = "# repositories\n\n%s\n%s\n" % (self.good.path, self.behind.path)
+        with tempfile.TemporaryDirectory() as elsewhere:  # not inside any repository
+            path = os.path.join(elsewhere, "repos.txt")
+            with open(path, "w") as f:
+                f.write(listing)
+            found = tdver(elsewhere, "fleet", path, "-j", "2")
+        lines = [json.loads(line) for line in found.stdout.splitlines()]
+        self.assertEqual(found.returncode, 1, found.stderr)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[-1]["summary"]["total"], 2)
+        self.assertEqual(lines[-1]["summary"]["ok"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
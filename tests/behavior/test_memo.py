@@ -0,0 +1,122 @@
+"""The persistent result cache: LRU order, keys, and reuse across runs"""
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, counters  # noqa: E402
+from tdver.classify import ChangeSummary, DiffBudget  # noqa: E402
+from tdver.core import Repo, TDVer  # noqa: E402
+from tdver.memo import ResultCache  # noqa: E402
+
+BUDGET = DiffBudget(DiffBudget.SIZE_LIMIT, "skip")
+
+
+def summary(insertions):
+    found = ChangeSummary(["tests"])
+    found.count("tests", insertions, 0)
+    found.files_changed = 1
+    return found
+
+
+class LRU(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.repo = Repo(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def fill(self, cache, *keys):
+        for key in keys:
+            cache.put(key, summary(len(key)), 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(self.repo, size=3)
+        self.fill(cache, "a", "bb", "ccc")
+        self.assertIsNotNone(cache.get("a"))  # now the most recently used
+        self.fill(cache, "dddd")
+        cache = ResultCache(self.repo, size=3)  # as the next run sees it
+        self.assertIsNone(cache.get("bb"))
+        self.assertEqual(list(cache.load()), ["ccc", "a", "dddd"])
+        found, part = cache.get("dddd")
+        self.assertEqual((found["tests"], found.files_changed, part), ((4, 0), 1, 1))
+
+    def test_batched(self):
+        cache = ResultCache(self.repo, size=2)
+        cache.put("a", summary(1), 3, save=False)
+        cache.put("b", summary(2), 3, save=False)
+        self.assertIsNone(ResultCache(self.repo).get("a"))  # not saved yet
+        cache.save()
+        self.assertIsNotNone(ResultCache(self.repo).get("a"))
+
+    def test_disabled(self):
+        cache = ResultCache(self.repo, size=0)
+        self.fill(cache, "a")
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(cache.path))
+
+    def test_unreadable(self):
+        cache = ResultCache(self.repo)
+        os.makedirs(os.path.dirname(cache.path), exist_ok=True)
+        for text in ("not json", '{"format": 1, "entries": {"a": {}}}'):
+            with open(cache.path, "w") as f:
+                f.write(text)
+            self.assertIsNone(ResultCache(self.repo).get("a"))
+        self.fill(cache, "a")  # and replaced by the next put
+        self.assertIsNotNone(ResultCache(self.repo).get("a"))
+
+    def test_keys(self):
+        roots = {"tests": "tests/", "bug_tests": "bugs/"}
+        key = ResultCache.key("a", "b", roots, BUDGET)
+        self.assertEqual(key, ResultCache.key("a", "b", dict(roots), BUDGET))
+        self.assertNotEqual(key, ResultCache.key("b", "a", roots, BUDGET))
+        self.assertNotEqual(
+            key, ResultCache.key("a", "b", dict(roots, tests="test/"), BUDGET)
+        )
+        for budget in (DiffBudget(0, "skip"), DiffBudget(1, "status")):
+            self.assertNotEqual(key, ResultCache.key("a", "b", roots, budget))
+
+
+class Reuse(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tests/t.txt", "a\n")
+        self.scratch.write("src/s.txt", "s\n")
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+        self.scratch.write("tests/t.txt", "a\nb\n")
+        self.scratch.commit("add a test")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def check(self, config=None):
+        judged = TDVer(config, repo=Repo(self.scratch.path), path="")
+        result, counted = counters(judged.check)
+        return result.as_dict(), judged.summary["tests"], counted
+
+    def test_across_runs(self):
+        first, tests, counted = self.check()
+        self.assertEqual((counted["result_miss"], tests), (1, (1, 0)))
+        again, cached, counted = self.check()
+        self.assertEqual((again, cached), (first, tests))
+        self.assertEqual(counted["result_hit"], 1)
+        self.assertNotIn("deltas", counted)  # no diff at all
+
+    def test_config_is_part_of_the_key(self):
+        self.check()
+        config = dict(TDVer.config, tests="src/")
+        found, tests, counted = self.check(config)
+        self.assertEqual(counted["result_miss"], 1)
+        self.assertEqual((tests, found["part"]), ((0, 0), "d"))
+        _, _, counted = self.check(dict(TDVer.config, diff_size_limit=0))
+        self.assertEqual(counted["result_miss"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,277 @@
+"""CommitGraph and nearest_tag() against git's own view of the same history"""
+import os
+import sys
+import shutil
+import unittest
+from unittest import mock
+import pygit2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch  # noqa: E402
+from tdver.core import Repo, TDVer  # noqa: E402
+from tdver.nearest import (  # noqa: E402
+    AncestorWalk,
+    CommitGraph,
+    nearest_tag,
+    nearest_tag_each,
+    nearest_tags,
+)
+from tdver.refs import RefChecker  # noqa: E402
+from tdver.results import HistoryIncomplete, TDVerError  # noqa: E402
+from tdver.tags import TagCache  # noqa: E402
+from tdver.workspace import Workspace  # noqa: E402
+
+
+def build_history(scratch):
+    """
+    0.1.0 -- a -- b ----------- octopus -- c
+                   \\ 0.1.1 ----/ / /
+                    \\ feature --/ /
+                     \\ 0.2.0 ----/
+
+    The octopus merge has four parents, so three of them are stored in
+    the commit-graph's extra edge list.
+    """
+    scratch.write("tests/t.txt", "0\n")
+    scratch.commit("initial")
+    scratch.git("tag", "0.1.0")
+    for name in ("a", "b"):
+        scratch.write(name, name)
+        scratch.commit(name)
+    for branch, tag in (("bugfix", "0.1.1"), ("feature", None), ("minor", "0.2.0")):
+        scratch.git("checkout", "-q", "-b", branch, "main")
+        scratch.write(branch, branch)
+        scratch.commit(branch)
+        if tag:
+            scratch.git("tag", "-a", "-m", "release", tag)
+    scratch.git("checkout", "-q", "main")
+    scratch.git("merge", "-q", "--no-ff", "-m", "octopus", "bugfix", "feature", "minor")
+    scratch.write("c", "c")
+    scratch.commit("c")
+
+
+def git_parents(scratch):
+    """{commit: [parents, in order]} for every commit, from git rev-list."""
+    found = {}
+    for line in scratch.git("rev-list", "--all", "--parents").splitlines():
+        commit, *parents = line.split()
+        found[commit] = parents
+    return found
+
+
+def levels(parents):
+    """Each commit's topological level: 1 for roots, else 1 + its parents' max."""
+    found = {}
+
+    def level(commit):
+        if commit not in found:
+            found[commit] = 1 + max((level(p) for p in parents[commit]), default=0)
+        return found[commit]
+
+    for commit in parents:
+        level(commit)
+    return found
+
+
+class Graph(unittest.TestCase):
+    object_format = "sha1"
+
+    def setUp(self):
+        self.scratch = Scratch(self.object_format)
+        build_history(self.scratch)
+        self.scratch.git("commit-graph", "write", "--reachable")
+        self.graph = CommitGraph.load(os.path.join(self.scratch.path, ".git"))
+        self.assertIsNotNone(self.graph)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def test_matches_rev_list(self):
+        parents = git_parents(self.scratch)
+        generations = levels(parents)
+        self.assertEqual(self.graph.count, len(parents))
+        self.assertIn(4, [len(p) for p in parents.values()])  # the octopus
+        for commit, expected in parents.items():
+            pos = self.graph.position(commit)
+            self.assertIsNotNone(pos, commit)
+            self.assertEqual(self.graph.oid(pos), commit)
+            generation, found = self.graph.commit(pos)
+            self.assertEqual([self.graph.oid(p) for p in found], expected, commit)
+            self.assertEqual(generation, generations[commit], commit)
+
+    def test_unknown_commits(self):
+        self.assertIsNone(self.graph.position("00" * self.graph.hash_size))
+        self.assertIsNone(self.graph.position("ff" * self.graph.hash_size))
+        self.scratch.write("d", "d")
+        after = self.scratch.commit("written after the graph")
+        self.assertIsNone(self.graph.position(after))
+
+
+class GraphSHA256(Graph):
+    object_format = "sha256"
+
+
+class Nearest(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        build_history(self.scratch)
+        self.repo = pygit2.Repository(self.scratch.path)
+        self.tagged = TagCache(self.repo, TDVer.parse_tag).tagged("")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def expected(self, start):
+        """The highest tag whose commit git says start contains."""
+        found = []
+        for name in self.scratch.git("tag", "--merged", start).split():
+            commit = self.scratch.git("rev-parse", name + "^{commit}").strip()
+            found.append((TDVer.parse_tag(name), name, commit))
+        return max(found) if found else None
+
+    def nearest(self, start, graph):
+        found = nearest_tag(self.repo, start, self.tagged, graph=graph)
+        return found and (found.version, found.name, found.commit)
+
+    def test_with_and_without_graph(self):
+        commits = git_parents(self.scratch)
+        without = {start: self.nearest(start, None) for start in commits}
+        self.scratch.git("commit-graph", "write", "--reachable")
+        graph = CommitGraph.load(os.path.join(self.scratch.path, ".git"))
+        self.assertIsNotNone(graph)
+        for start in commits:
+            self.assertEqual(without[start], self.expected(start), start)
+            self.assertEqual(self.nearest(start, graph), without[start], start)
+        # one walk from every commit at once agrees with one walk each
+        each = nearest_tag_each(self.repo, list(commits), self.tagged, graph=graph)
+        for start in commits:
+            found = nearest_tag(self.repo, start, self.tagged, graph=graph)
+            self.assertEqual(each[start], found, start)
+
+    def test_through_octopus(self):
+        head = self.scratch.git("rev-parse", "HEAD").strip()
+        self.scratch.git("commit-graph", "write", "--reachable")
+        graph = CommitGraph.load(os.path.join(self.scratch.path, ".git"))
+        found = nearest_tag(self.repo, head, self.tagged, graph=graph)
+        self.assertEqual(found.name, "0.2.0")
+        self.assertEqual(found.distance, 2)  # c -> octopus -> minor
+
+    def test_split_chain_is_not_read(self):
+        self.scratch.git("commit-graph", "write", "--reachable", "--split")
+        self.assertIsNone(CommitGraph.load(os.path.join(self.scratch.path, ".git")))
+
+
+def build_skewed(scratch):
+    """
+    0.1.0 -- p -- x ------ merge
+                \\ y ----/
+                pkg/0.1.1
+
+    p's clock was ahead: it's dated after both its children, so a walk
+    ordered by commit time reaches p through y before it gets to x.
+    """
+    scratch.write("tests/t.txt", "0\n")
+    scratch.commit("initial", date="1700001000 +0000")
+    scratch.git("tag", "0.1.0")
+    scratch.git("tag", "pkg/0.1.0")
+    scratch.write("p", "p")
+    scratch.commit("p", date="1700005000 +0000")
+    scratch.git("checkout", "-q", "-b", "side")
+    scratch.write("y", "y")
+    scratch.commit("y", date="1700003000 +0000")
+    scratch.git("tag", "pkg/0.1.1")
+    scratch.git("checkout", "-q", "main")
+    scratch.write("x", "x")
+    scratch.commit("x", date="1700002000 +0000")
+    date = "1700006000 +0000"
+    env = {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    scratch.git("merge", "-q", "--no-ff", "-m", "merge", "side", env=env)
+    return scratch.git("rev-parse", "HEAD").strip()
+
+
+class Skewed(unittest.TestCase):
+    """Parents dated after their children, with no commit-graph to fall back on."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.head = build_skewed(self.scratch)
+        self.repo = pygit2.Repository(self.scratch.path)
+        self.tagged = TagCache(self.repo, TDVer.parse_tag).tagged_by_prefix()
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def test_nearest_tags(self):
+        found = nearest_tags(self.repo, self.head, self.tagged)
+        self.assertEqual(found[""].name, "0.1.0")
+        self.assertEqual(found["pkg/"].name, "pkg/0.1.1")
+        for prefix, tagged in self.tagged.items():
+            self.assertEqual(found[prefix], nearest_tag(self.repo, self.head, tagged))
+
+    def test_nearest_tag_each_walks_once(self):
+        tagged = self.tagged[""]
+        starts = [self.head, self.scratch.git("rev-parse", "side").strip()]
+        visit = AncestorWalk.visit
+        with mock.patch.object(AncestorWalk, "visit", autospec=True) as counted:
+            counted.side_effect = visit
+            found = nearest_tag_each(self.repo, starts, tagged)
+        visited = [call.args[1] for call in counted.call_args_list]
+        self.assertEqual(sorted(visited), sorted(set(visited)))
+        for start in starts:
+            self.assertEqual(found[start], nearest_tag(self.repo, start, tagged))
+
+
+class Failures(unittest.TestCase):
+    """check, check --all and check --refs give up on a walk the same way."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        build_history(self.scratch)
+        self.scratch.write("tdver.json", '{"version": "0.2.0"}')
+        self.scratch.commit("config")
+        self.clone = self.scratch.path + ".clone"
+
+    def tearDown(self):
+        shutil.rmtree(self.clone, ignore_errors=True)
+        self.scratch.remove()
+
+    def errors(self, path, config):
+        """What check, check --all and check --refs each end with."""
+        repo = Repo(path)
+
+        def refs():
+            checker = RefChecker(TDVer(config, repo=repo, path=""), overrides=config)
+            return list(checker.check(["refs/heads/main"]))[0][2]
+
+        found = []
+        for attempt in (
+            lambda: TDVer(config, repo=repo, path="").check(),
+            lambda: dict(Workspace(repo, config=config).check())[""],
+            refs,
+        ):
+            try:
+                found.append(attempt())
+            except TDVerError as e:
+                found.append(e)
+        return found
+
+    def test_walk_limit(self):
+        for error in self.errors(self.scratch.path, {"walk_limit": 1}):
+            self.assertIsInstance(error, TDVerError)
+            self.assertIn("(see walk_limit)", str(error))
+
+    def test_shallow(self):
+        url = "file://" + self.scratch.path
+        self.scratch.git("clone", "-q", "--depth", "1", url, self.clone)
+        for error in self.errors(self.clone, {}):
+            self.assertIsInstance(error, HistoryIncomplete)
+            self.assertIn("in this shallow clone", str(error))
+            self.assertIn("--unshallow", str(error))
+
+
+if __name__ == "__main__":
+    unittest.main()
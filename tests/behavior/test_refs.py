@@ -0,0 +1,118 @@
+"""check --refs: many branches judged at once, each by its own tdver.json"""
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, counters  # noqa: E402
+from tdver.core import Repo, TDVer  # noqa: E402
+from tdver.refs import RefChecker, matches  # noqa: E402
+from tdver.results import TDVerError  # noqa: E402
+
+
+class Refs(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        self.scratch.write("tests/t.txt", "a\n")
+        self.scratch.write("spec/s.txt", "a\n")
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def branch(self, name, files):
+        self.scratch.git("checkout", "-q", "-b", name, "main")
+        for path, text in files.items():
+            self.scratch.write(path, text)
+        self.scratch.commit(name)
+        self.scratch.git("checkout", "-q", "main")
+
+    def check(self, *patterns, workers=None):
+        tdver = TDVer(None, repo=Repo(self.scratch.path), path="")
+        return {
+            name: result
+            for name, _, result in RefChecker(tdver, workers).check(patterns)
+        }
+
+    def test_several_refs(self):
+        self.branch("pr/add", {"tests/t.txt": "a\nb\n"})
+        self.branch("pr/change", {"tests/t.txt": "b\n"})
+        self.branch("pr/src", {"src.txt": "x\n"})
+        for workers in (1, 4):
+            found = self.check("refs/heads/pr", workers=workers)
+            self.assertEqual(
+                sorted(found),
+                ["refs/heads/pr/add", "refs/heads/pr/change", "refs/heads/pr/src"],
+            )
+            self.assertEqual(str(found["refs/heads/pr/add"].required), "0.2.0")
+            self.assertEqual(str(found["refs/heads/pr/change"].required), "1.0.0")
+            self.assertEqual(str(found["refs/heads/pr/src"].required), "0.1.0-1")
+        self.assertTrue(self.check("refs/heads/main")["refs/heads/main"].ok)
+
+    def test_results_reused(self):
+        self.branch("pr/add", {"tests/t.txt": "a\nb\n"})
+        self.branch("pr/src", {"src.txt": "x\n"})
+        first, counted = counters(lambda: self.check("refs/heads/pr"))
+        self.assertEqual(counted["result_miss"], 2)
+        again, counted = counters(lambda: self.check("refs/heads/pr"))
+        self.assertEqual(counted["result_hit"], 2)
+        self.assertNotIn("deltas", counted)  # nothing diffed
+        self.assertEqual(
+            {name: result.as_dict() for name, result in again.items()},
+            {name: result.as_dict() for name, result in first.items()},
+        )
+        # and a plain check of the same commit shares the entry
+        self.scratch.git("checkout", "-q", "pr/add")
+        tdver = TDVer(None, repo=Repo(self.scratch.path), path="")
+        _, counted = counters(tdver.check)
+        self.assertEqual(counted["result_hit"], 1)
+
+    def test_each_ref_by_its_own_config(self):
+        # spec/ only holds tests on this branch; main would call it part D
+        self.branch(
+            "pr/spec",
+            {
+                "tdver.json": '{"version": "0.1.0", "tests": "spec/"}',
+                "spec/s.txt": "a\nb\n",
+            },
+        )
+        found = self.check("refs/heads/pr/*")["refs/heads/pr/spec"]
+        self.assertEqual(str(found.required), "0.2.0")
+
+    def test_each_ref_by_its_own_tag_prefix(self):
+        self.scratch.git("tag", "lib/0.5.0")
+        self.branch(
+            "pr/lib",
+            {
+                "tdver.json": '{"version": "0.5.0", "tag_prefix": "lib/"}',
+                "tests/t.txt": "a\nb\n",
+            },
+        )
+        found = self.check("refs/heads/pr/lib", "refs/heads/main")
+        self.assertEqual(str(found["refs/heads/pr/lib"].required), "0.6.0")
+        self.assertTrue(found["refs/heads/main"].ok)
+
+    def test_ref_without_config(self):
+        self.scratch.git("checkout", "-q", "--orphan", "bare-docs")
+        self.scratch.git("rm", "-q", "-r", "--cached", ".")
+        self.scratch.git("commit", "-q", "--allow-empty", "-m", "no tdver.json")
+        self.scratch.git("checkout", "-q", "-f", "main")
+        found = self.check("refs/heads/")
+        self.assertIsInstance(found["refs/heads/bare-docs"], TDVerError)
+        self.assertTrue(found["refs/heads/main"].ok)
+
+    def test_matches(self):
+        self.assertTrue(matches("refs/heads/pr/1", "refs/heads/pr/*"))
+        self.assertTrue(matches("refs/heads/pr/1", "refs/heads/pr"))
+        self.assertTrue(matches("refs/heads/pr/1", "refs/heads/"))
+        self.assertFalse(matches("refs/heads/prod", "refs/heads/pr"))
+
+
+if __name__ == "__main__":
+    unittest.main()
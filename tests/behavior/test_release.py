@@ -0,0 +1,141 @@
+"""tdver release in bare and sparse clones, and the git objects it writes"""
+import os
+import sys
+import json
+import shutil
+import subprocess
+import unittest
+import pygit2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, tdver  # noqa: E402
+from tdver import odb  # noqa: E402
+from tdver.results import TDVerError  # noqa: E402
+from tdver.session import Session  # noqa: E402
+
+CONFIG = {"version": "0.1.0", "tests": "spec/", "owner": "team"}
+
+
+class Committed(unittest.TestCase):
+    """A test added under the configured (non-default) root requires part B."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", json.dumps(CONFIG))
+        self.scratch.write("spec/a.txt", "a\n")
+        self.scratch.write("src/s.txt", "s\n")
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+        self.scratch.write("spec/a.txt", "a\nb\n")
+        self.scratch.commit("add a test")
+        self.clone = self.scratch.path + ".clone"
+
+    def tearDown(self):
+        shutil.rmtree(self.clone, ignore_errors=True)
+        self.scratch.remove()
+
+    def git(self, *args):
+        """Run git in the clone and return its stdout."""
+        return subprocess.run(
+            ("git", "-C", self.clone) + args, capture_output=True, text=True, check=True
+        ).stdout
+
+    def assertReleased(self):
+        config = json.loads(self.git("show", "main:tdver.json"))
+        self.assertEqual(config["version"], "0.2.0")
+        self.assertEqual(config["tests"], "spec/")
+        self.assertEqual(config["owner"], "team")
+        self.assertIn("0.2.0", self.git("tag").split())
+
+    def test_bare_cli(self):
+        self.scratch.git("clone", "-q", "--bare", self.scratch.path, self.clone)
+        check = tdver(self.clone, "check")
+        self.assertIn("Required version: 0.2.0", check.stderr)
+        release = tdver(self.clone, "release", "--no-worktree")
+        self.assertEqual(release.returncode, 0, release.stderr)
+        self.assertReleased()
+
+    def test_bare_session(self):
+        self.scratch.git("clone", "-q", "--bare", self.scratch.path, self.clone)
+        session = Session(self.clone)
+        self.assertEqual(str(session.check().required), "0.2.0")
+        self.assertTrue(session.release(write_worktree=False).ok)
+        self.assertReleased()
+
+    def test_sparse(self):
+        self.scratch.git("clone", "-q", self.scratch.path, self.clone)
+        self.git("sparse-checkout", "set", "--no-cone", "/src/")
+        self.assertFalse(os.path.exists(os.path.join(self.clone, "tdver.json")))
+        release = tdver(self.clone, "release")
+        self.assertEqual(release.returncode, 0, release.stderr)
+        self.assertReleased()
+        self.assertEqual(self.git("status", "--porcelain"), "")
+
+
+class Objects(unittest.TestCase):
+    """The tag objects and ref updates release writes, as git sees them."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", json.dumps(CONFIG))
+        self.commit = self.scratch.commit("initial")
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def fsck(self):
+        # --strict also checks tag headers and idents; errors make git exit non-zero
+        found = self.scratch.git("fsck", "--strict", "--no-dangling", "--no-progress")
+        self.assertEqual(found, "")
+
+    def assertSameAsGit(self, offset, date, message):
+        """write_tag() writes byte-for-byte the tag `git tag -a` would."""
+        tagger = pygit2.Signature("Test", "test@example.com", 1700000000, offset)
+        ours = odb.write_tag(self.repo, "1.0.0", self.commit, tagger, message)
+        date = {"GIT_COMMITTER_DATE": "1700000000 " + date}
+        self.scratch.git("tag", "-a", "-m", message, "1.0.0", self.commit, env=date)
+        theirs = self.scratch.git("rev-parse", "refs/tags/1.0.0").strip()
+        self.assertEqual(str(ours), theirs)
+        self.assertEqual(self.scratch.git("cat-file", "-t", str(ours)).strip(), "tag")
+        self.scratch.git("tag", "-d", "1.0.0")
+
+    def test_matches_git_tag(self):
+        self.assertSameAsGit(0, "+0000", "Version 1.0.0 released via TDVer")
+        self.assertSameAsGit(-330, "-0530", "Version 1.0.0 released via TDVer\n")
+        self.assertSameAsGit(345, "+0545", "two\n\nparagraphs")
+
+    def test_fsck(self):
+        tagger = pygit2.Signature("Test", "test@example.com", 1700000000, 60)
+        tag = odb.write_tag(self.repo, "1.0.0", self.commit, tagger, "release")
+        raw = self.scratch.git("cat-file", "tag", str(tag))
+        self.assertEqual(self.scratch.git("mktag", stdin=raw).strip(), str(tag))
+        odb.update_refs(self.repo, {"refs/tags/1.0.0": (None, tag)}, "test")
+        self.assertEqual(self.scratch.git("describe").strip(), "1.0.0")
+        self.fsck()
+
+    def test_update_refs_all_or_nothing(self):
+        tagger = pygit2.Signature("Test", "test@example.com", 1700000000, 0)
+        tag = odb.write_tag(self.repo, "1.0.0", self.commit, tagger, "release")
+        self.scratch.write("moved", "moved")
+        moved = self.scratch.commit("moved meanwhile")
+        with self.assertRaises(TDVerError):
+            odb.update_refs(
+                self.repo,
+                {
+                    "refs/tags/1.0.0": (None, tag),
+                    "refs/heads/main": (pygit2.Oid(hex=self.commit), tag),
+                },
+                "test",
+            )
+        self.assertEqual(self.scratch.git("rev-parse", "main").strip(), moved)
+        self.assertEqual(self.scratch.git("tag"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""When tdver check hands off to a daemon, and when it runs in-process instead"""
+import os
+import sys
+import json
+import socket
+import threading
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, tdver  # noqa: E402
+from tdver.serve import CONNECT_TIMEOUT, request, socket_path  # noqa: E402
+from tdver.server import Server  # noqa: E402
+from tdver.session import Session  # noqa: E402
+
+
+class FakeDaemon(threading.Thread):
+    """
+    Listens where `tdver serve` would, records each request and answers
+    it with reply; with reply None, it accepts and never answers.
+    """
+
+    def __init__(self, scratch, reply):
+        super().__init__(daemon=True)
+        self.reply = reply
+        self.requests = []
+        self.done = threading.Event()
+        path = socket_path(os.path.join(scratch.path, ".git"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen()
+        self.sock.settimeout(0.1)
+
+    def run(self):
+        while not self.done.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            with conn, conn.makefile("rwb") as stream:
+                self.requests.append(json.loads(stream.readline()))
+                if self.reply is None:
+                    self.done.wait()
+                    continue
+                stream.write(json.dumps(self.reply).encode() + b"\n")
+                stream.flush()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        self.sock.close()
+
+
+class Forwarding(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def daemon(self, reply):
+        daemon = FakeDaemon(self.scratch, reply)
+        daemon.start()
+        self.addCleanup(daemon.stop)
+        return daemon
+
+    def test_no_daemon_env(self):
+        daemon = self.daemon({"ok": True, "message": "from the daemon"})
+        for value in ("0", "false", ""):
+            found = tdver(self.scratch.path, "check", env={"TDVER_NO_DAEMON": value})
+            self.assertEqual(found.stdout, "from the daemon\n", value)
+        found = tdver(self.scratch.path, "check", env={"TDVER_NO_DAEMON": "1"})
+        self.assertNotEqual(found.stdout, "from the daemon\n")
+        self.assertEqual(found.returncode, 0, found.stderr)
+        self.assertEqual(len(daemon.requests), 3)
+        self.assertEqual(daemon.requests[0], {"command": "check", "path": ""})
+
+    def test_wedged_daemon(self):
+        daemon = self.daemon(None)
+        started = time.monotonic()
+        self.assertIsNone(request(self.scratch.path, "check", timeout=0.2))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(daemon.requests, [{"command": "check", "path": ""}])
+
+    def test_serve_over_a_wedged_daemon(self):
+        self.daemon(None)
+        started = time.monotonic()
+        server = Server(Session(self.scratch.path))  # its ping times out
+        server.server_close()
+        os.unlink(server.server_address)
+        self.assertLess(time.monotonic() - started, CONNECT_TIMEOUT + 2)
+
+    def test_no_daemon(self):
+        self.assertIsNone(request(self.scratch.path, "check"))
+        found = tdver(self.scratch.path, "check", env={"TDVER_NO_DAEMON": "0"})
+        self.assertEqual(found.returncode, 0, found.stderr)
+
+
+class Serving(unittest.TestCase):
+    """A real Server, run in a thread, against the in-process answers."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        self.scratch.write("tests/t.txt", "a\n")
+        self.scratch.commit("initial")
+        self.scratch.git("tag", "0.1.0")
+        self.server = Server(Session(self.scratch.path))
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        # run() installs a SIGTERM handler, which only the main thread may do
+        while self.server.running:
+            self.server.handle_request()
+        self.server.server_close()
+
+    def tearDown(self):
+        if self.server.running:
+            request(self.scratch.path, "stop")
+        self.thread.join()
+        self.scratch.remove()
+
+    def check(self):
+        reply = request(self.scratch.path, "check")
+        expected = Session(self.scratch.path).check()
+        self.assertEqual(reply["message"], expected.message)
+        self.assertEqual(reply["result"], expected.as_dict())
+        return reply
+
+    def test_round_trip(self):
+        self.assertEqual(request(self.scratch.path, "ping"), {"ok": True})
+        self.assertTrue(self.check()["ok"])
+        cached = self.server.session.cached[""][1]
+        self.check()
+        self.assertIs(self.server.session.cached[""][1], cached)
+
+    def test_head_moves(self):
+        self.check()
+        cached = self.server.session.cached[""][1]
+        self.scratch.write("tests/t.txt", "b\n")
+        # only committed changes are diffed; being dirty alone calls for D
+        self.assertEqual(self.check()["result"]["part"], "d")
+        self.assertIs(self.server.session.cached[""][1], cached)
+        self.scratch.commit("change a test")
+        reply = self.check()
+        self.assertFalse(reply["ok"])
+        self.assertEqual(reply["result"]["required"], "1.0.0")
+        self.assertIsNot(self.server.session.cached[""][1], cached)
+        self.scratch.git("tag", "1.0.0")
+        self.assertTrue(self.check()["ok"])
+
+    def test_bad_requests(self):
+        self.assertIn("error", self.server.dispatch("rm"))
+        self.assertIn("error", self.server.dispatch("check", "../elsewhere"))
+        self.assertIn("error", self.server.dispatch("check", "/tmp"))
+        self.assertIn("error", self.server.dispatch("check", "missing"))
+
+    def test_stop(self):
+        self.assertEqual(request(self.scratch.path, "stop"), {"ok": True})
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertIsNone(request(self.scratch.path, "ping"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""tdver support --plan/--all against the branches one support per release makes"""
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, tdver  # noqa: E402
+from tdver.core import Repo, TDVer  # noqa: E402
+
+RELEASES = ["0.1.0", "0.1.1", "0.2.0", "1.0.0", "1.0.0-1", "1.1.0"]
+
+
+class Support(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("tdver.json", '{"version": "0.1.0"}')
+        for tag in RELEASES:
+            self.scratch.write("src/s.txt", tag)
+            self.scratch.commit(tag)
+            self.scratch.git("tag", tag)
+        self.scratch.write("src/s.txt", "unreleased")
+        self.scratch.commit("unreleased")
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def judged(self):
+        return TDVer(None, repo=Repo(self.scratch.path), path="")
+
+    def one_at_a_time(self):
+        """branch -> the highest release support would branch it from, per release"""
+        judged = self.judged()
+        found = {}
+        for tag in RELEASES:
+            version = TDVer.parse_tag(tag)
+            tip = judged.get_tip(version)
+            if tip is not None:
+                branch = judged.format_tip(tip)
+                found[branch] = max(found.get(branch, version), version)
+        return found
+
+    def commit(self, rev):
+        return self.scratch.git("rev-parse", rev + "^{commit}").strip()
+
+    def test_plan(self):
+        plan = self.judged().plan_support()
+        self.assertEqual(
+            {branch: version for branch, version, _, _ in plan.tips},
+            self.one_at_a_time(),
+        )
+        self.assertEqual(
+            [(branch, str(version)) for branch, version, _, _ in plan.tips],
+            [("0.1.x", "0.1.1"), ("0.x", "0.2.0"), ("1.0.x", "1.0.0-1")],
+        )
+        for branch, version, commit, state in plan.tips:
+            self.assertEqual(commit, self.commit(str(version)), branch)
+            self.assertEqual(state, "missing")
+        self.assertEqual(self.scratch.git("branch", "--list", "*.x"), "")
+
+    def test_all(self):
+        self.scratch.git("branch", "0.x", "0.1.0")  # already there, somewhere else
+        plan = self.judged().support_all()
+        states = {branch: state for branch, _, _, state in plan.tips}
+        self.assertEqual(
+            states, {"0.1.x": "created", "0.x": "exists", "1.0.x": "created"}
+        )
+        for branch, version, _, _ in plan.tips:
+            if branch != "0.x":
+                self.assertEqual(self.commit(branch), self.commit(str(version)))
+        self.assertEqual(self.commit("0.x"), self.commit("0.1.0"))  # left alone
+        plan = self.judged().support_all()
+        self.assertEqual({tip[3] for tip in plan.tips}, {"exists"})
+
+    def test_nothing_to_maintain(self):
+        scratch = Scratch()
+        self.addCleanup(scratch.remove)
+        scratch.write("tdver.json", '{"version": "0.1.0"}')
+        scratch.commit("initial")
+        scratch.git("tag", "0.1.0")
+        plan = TDVer(None, repo=Repo(scratch.path), path="").support_all()
+        self.assertEqual(plan.tips, [])
+        self.assertEqual(plan.message, "No version can be maintained yet.")
+
+    def test_cli(self):
+        found = tdver(self.scratch.path, "support", "--plan")
+        self.assertEqual(found.returncode, 0, found.stderr)
+        self.assertEqual(
+            [line.split() for line in found.stdout.splitlines()],
+            [
+                ["0.1.x", "0.1.1", "missing"],
+                ["0.x", "0.2.0", "missing"],
+                ["1.0.x", "1.0.0-1", "missing"],
+            ],
+        )
+        found = tdver(self.scratch.path, "support", "--all")
+        self.assertEqual(found.returncode, 0, found.stderr)
+        self.assertEqual(
+            self.scratch.git("branch", "--list", "*.x", "--format=%(refname:short)"),
+            "0.1.x\n0.x\n1.0.x\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
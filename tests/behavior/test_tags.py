@@ -0,0 +1,117 @@
+"""The parsed-tag index kept under the git directory, against git's own tags"""
+import os
+import sys
+import unittest
+import pygit2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch, counters  # noqa: E402
+from tdver.core import TDVer  # noqa: E402
+from tdver.tags import TagCache  # noqa: E402
+
+
+def versions(cache, prefix=""):
+    """A prefix's sorted versions, as tuples (the index stores JSON lists)."""
+    return [tuple(version) for version in cache.versions(prefix)]
+
+
+class Index(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        self.commits = []
+        for n in range(3):
+            self.scratch.write("n", str(n))
+            self.commits.append(self.scratch.commit(str(n)))
+        self.scratch.git("tag", "0.1.0", self.commits[0])
+        self.scratch.git("tag", "-a", "-m", "annotated", "0.2.0", self.commits[1])
+        self.scratch.git("tag", "pkg/1.0.0", self.commits[2])
+        self.scratch.git("tag", "not-a-version", self.commits[2])
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def cache(self):
+        return TagCache(self.repo, TDVer.parse_tag)
+
+    def expected(self):
+        """{prefix: {commit: {tag name}}} for every version tag, from git."""
+        found = {}
+        for name in self.scratch.git("tag").split():
+            prefix, _, version = name.rpartition("/")
+            if TDVer.parse_tag(version) is None:
+                continue
+            commit = self.scratch.git("rev-parse", name + "^{commit}").strip()
+            prefix = prefix + "/" if prefix else ""
+            found.setdefault(prefix, {}).setdefault(commit, set()).add(name)
+        return found
+
+    def assertMatchesGit(self, cache):
+        found = {
+            prefix: {commit: {tag[1] for tag in tags} for commit, tags in by.items()}
+            for prefix, by in cache.tagged_by_prefix().items()
+        }
+        self.assertEqual(found, self.expected())
+        for prefix, by in cache.tagged_by_prefix().items():
+            for tags in by.values():
+                for _, name, oid in tags:
+                    ref = self.scratch.git("rev-parse", "refs/tags/" + name).strip()
+                    self.assertEqual(oid, ref)  # the tag object, if annotated
+
+    def test_matches_git(self):
+        cache = self.cache()
+        self.assertMatchesGit(cache)
+        self.assertEqual(versions(cache), [(0, 1, 0, 0), (0, 2, 0, 0)])
+        self.assertEqual(versions(cache, "pkg/"), [(1, 0, 0, 0)])
+        self.assertTrue(os.path.exists(cache.path))
+
+    def test_reused_across_processes(self):
+        self.cache().index()
+        _, counted = counters(lambda: self.cache().index())
+        self.assertEqual(counted.get("cache_hit"), 1)
+        self.assertNotIn("refs", counted)  # no ref was enumerated
+        self.assertNotIn("parsed", counted)
+
+    def test_reused_in_process(self):
+        cache = self.cache()
+        cache.index()
+        _, counted = counters(cache.index)
+        self.assertEqual(counted.get("memo_hit"), 1)
+
+    def test_only_new_tags_are_parsed(self):
+        cache = self.cache()
+        cache.index()
+        self.scratch.git("tag", "0.3.0", self.commits[2])
+        _, counted = counters(lambda: self.cache().index())
+        self.assertEqual(counted.get("parsed"), 1)
+        self.assertMatchesGit(self.cache())
+        self.assertEqual(versions(cache)[-1], (0, 3, 0, 0))
+
+    def test_moved_and_deleted_tags(self):
+        self.cache().index()
+        self.scratch.git("tag", "-d", "0.1.0")
+        self.scratch.git("tag", "-f", "0.2.0", self.commits[2])
+        self.assertMatchesGit(self.cache())
+        self.assertEqual(versions(self.cache()), [(0, 2, 0, 0)])
+
+    def test_packed_refs(self):
+        self.cache().index()
+        self.scratch.git("pack-refs", "--all")
+        self.assertMatchesGit(self.cache())
+        self.scratch.git("tag", "-d", "0.1.0")  # only in packed-refs now
+        self.assertMatchesGit(self.cache())
+
+    def test_corrupt_index(self):
+        cache = self.cache()
+        cache.index()
+        with open(cache.path, "w") as f:
+            f.write("{not json")
+        self.assertMatchesGit(self.cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Which part may increment, and which release is in the way when it can't"""
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+
+# pylint: disable=wrong-import-position
+from tdver.core import TDVer  # noqa: E402
+from tdver.versions import Version, VersionIndex  # noqa: E402
+
+
+def at(version, released):
+    """A TDVer at version with released tagged, touching no repository."""
+    tdver = TDVer()
+    tdver.versions = VersionIndex(Version(*v) for v in released)
+    tdver.version = Version(*version)
+    return tdver
+
+
+class Blocker(unittest.TestCase):
+    def test_top_release(self):
+        tdver = at((1, 0, 0, 0), [(0, 9, 0, 0), (1, 0, 0, 0)])
+        for pos in TDVer.POSITIONS:
+            self.assertIsNone(tdver.blocker(pos))
+            self.assertTrue(tdver.incrementable(pos))
+
+    def test_dev_behind_a_bugfix(self):
+        # 1.0.0-1 was never released; 1.0.1 is what stops it
+        tdver = at((1, 0, 0, 0), [(1, 0, 0, 0), (1, 0, 1, 0)])
+        self.assertEqual(tdver.blocker(TDVer.D), (1, 0, 1, 0))
+        self.assertFalse(tdver.incrementable(TDVer.D))
+        self.assertEqual(tdver.blocker(TDVer.C), (1, 0, 1, 0))
+        self.assertIsNone(tdver.blocker(TDVer.B))
+
+    def test_names_the_first_release_in_the_way(self):
+        tdver = at((1, 0, 0, 0), [(1, 0, 0, 0), (1, 0, 2, 0), (1, 0, 3, 0)])
+        self.assertEqual(tdver.blocker(TDVer.C), (1, 0, 2, 0))
+
+    def test_dev_release_taken(self):
+        tdver = at((1, 0, 0, 0), [(1, 0, 0, 0), (1, 0, 0, 1)])
+        self.assertEqual(tdver.blocker(TDVer.D), (1, 0, 0, 1))
+        self.assertIsNone(tdver.blocker(TDVer.C))
+
+
+class Reasons(unittest.TestCase):
+    def test_blocked_dev_release(self):
+        tdver = at((1, 0, 0, 0), [(1, 0, 0, 0), (1, 0, 1, 0)])
+        tdver.needs_increment = lambda: TDVer.D
+        tdver.reasons = lambda part: []
+        result = tdver.validate_version()
+        self.assertFalse(result.incrementable)
+        self.assertEqual(str(result.required), "1.0.0-1")
+        self.assertEqual(str(result.blocked_by), "1.0.1")
+        self.assertEqual(result.reasons, ["1.0.1 has already been released"])
+        self.assertIn("1.0.1 has already been released", result.message)
+        self.assertNotIn("1.0.0-1) already exists", result.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
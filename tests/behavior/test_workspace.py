@@ -0,0 +1,104 @@
+"""Monorepo packages: each one's tag prefix, and packages that would share one"""
+import os
+import sys
+import shutil
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch  # noqa: E402
+from tdver.core import Repo  # noqa: E402
+from tdver.results import TDVerError  # noqa: E402
+from tdver.session import Session  # noqa: E402
+from tdver.workspace import Workspace  # noqa: E402
+
+
+class Prefixes(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        for path in ("services/api", "clients/api"):
+            self.scratch.write(path + "/tests/t.txt", "t\n")
+            self.scratch.write(path + "/tdver.json", '{"version": "0.1.0"}')
+        self.scratch.write("tdver.json", '{"version": "0.0.0"}')
+        self.scratch.commit("initial")
+        for tag in ("0.0.0", "services/api/0.1.0", "clients/api/0.1.0"):
+            self.scratch.git("tag", tag)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def check(self):
+        workspace = Workspace(Repo(self.scratch.path))
+        return workspace, dict(workspace.check())
+
+    def test_same_directory_name(self):
+        workspace, results = self.check()
+        self.assertEqual(workspace.packages["services/api"].prefix, "services/api/")
+        self.assertEqual(workspace.packages["clients/api"].prefix, "clients/api/")
+        for path in ("", "services/api", "clients/api"):
+            self.assertTrue(results[path].ok, path)
+
+    def test_shared_prefix(self):
+        self.scratch.write(
+            "clients/api/tdver.json",
+            '{"version": "0.1.0", "tag_prefix": "services/api/"}',
+        )
+        self.scratch.commit("share a prefix")
+        _, results = self.check()
+        self.assertNotIsInstance(results[""], TDVerError)
+        for path in ("services/api", "clients/api"):
+            self.assertIsInstance(results[path], TDVerError)
+            self.assertIn("'services/api/' is also used by", str(results[path]))
+
+
+class Clones(unittest.TestCase):
+    """Packages are found from HEAD, not the index or the worktree."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        for path in ("services/api", "clients/web"):
+            self.scratch.write(path + "/tests/t.txt", "t\n")
+            self.scratch.write(path + "/tdver.json", '{"version": "0.1.0"}')
+        self.scratch.commit("initial")
+        for tag in ("services/api/0.1.0", "clients/web/0.1.0"):
+            self.scratch.git("tag", tag)
+        self.scratch.write("clients/web/tests/t.txt", "t\nu\n")
+        self.scratch.commit("add a test")
+        self.clone = self.scratch.path + ".clone"
+
+    def tearDown(self):
+        shutil.rmtree(self.clone, ignore_errors=True)
+        self.scratch.remove()
+
+    def assertChecked(self, results):
+        self.assertEqual(sorted(results), ["clients/web", "services/api"])
+        self.assertTrue(results["services/api"].ok)
+        self.assertFalse(results["clients/web"].ok)
+        self.assertEqual(str(results["clients/web"].required), "0.2.0")
+
+    def test_bare(self):
+        self.scratch.git("clone", "-q", "--bare", self.scratch.path, self.clone)
+        self.assertChecked(dict(Session(self.clone).check_all()))
+
+    def test_sparse(self):
+        self.scratch.git("clone", "-q", self.scratch.path, self.clone)
+        self.scratch.git("-C", self.clone, "sparse-checkout", "set", "services")
+        self.assertFalse(os.path.exists(os.path.join(self.clone, "clients")))
+        self.assertChecked(dict(Workspace(Repo(self.clone)).check()))
+
+    def test_no_packages(self):
+        empty = Scratch()
+        try:
+            empty.write("README", "no packages here\n")
+            empty.commit("initial")
+            with self.assertRaises(TDVerError):
+                Workspace(Repo(empty.path)).check()
+        finally:
+            empty.remove()
+
+
+if __name__ == "__main__":
+    unittest.main()
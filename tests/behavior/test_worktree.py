@@ -0,0 +1,159 @@
+"""index_entries() and dirty() against git's own reading of the same index"""
+import os
+import sys
+import unittest
+import pygit2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+# pylint: disable=wrong-import-position
+from scratch import Scratch  # noqa: E402
+from tdver import worktree  # noqa: E402
+
+
+def git_entries(scratch):
+    """
+    [(path, mtime_s, mtime_ns, ino, mode, size, flags, extended)] as git
+    reads the index, from `git ls-files --stage --debug`. git keeps the
+    extended flags in the high half of its in-memory flags word.
+    """
+    found = []
+    lines = iter(scratch.git("ls-files", "--stage", "--debug").splitlines())
+    for line in lines:
+        info, path = line.split("\t", 1)
+        mode = int(info.split()[0], 8)
+        fields = {}
+        for _ in range(5):  # ctime, mtime, dev/ino, uid/gid, size/flags
+            for field in next(lines).split("\t"):
+                key, value = field.strip().split(": ")
+                fields[key] = value
+        mtime_s, mtime_ns = (int(part) for part in fields["mtime"].split(":"))
+        flags = int(fields["flags"], 16)
+        found.append(
+            (
+                path,
+                mtime_s,
+                mtime_ns,
+                int(fields["ino"]) & 0xFFFFFFFF,
+                mode,
+                int(fields["size"]),
+                flags & 0xF000,
+                (flags >> 16) & 0x6000,
+            )
+        )
+    return found
+
+
+def our_entries(scratch):
+    with open(os.path.join(scratch.path, ".git", "index"), "rb") as f:
+        data = f.read()
+    return [
+        entry[:6] + (entry[6] & 0xF000, entry[7])
+        for entry in worktree.index_entries(data)
+    ]
+
+
+class IndexEntries(unittest.TestCase):
+    def setUp(self):
+        self.scratch = Scratch()
+        scratch = self.scratch
+        scratch.write("README", "hello\n")
+        scratch.write("src/tdver/core.py", "x = 1\n")
+        scratch.write("src/tdver/cli.py", "y = 2\n")
+        scratch.write("src/tdver/classify.py", "z = 3\n")  # shares a v4 prefix
+        os.chmod(scratch.write("run.sh", "#!/bin/sh\n"), 0o755)
+        scratch.commit("initial")
+        # a path too long for the 12 length bits in an entry's flags (and
+        # for the filesystem, so it's only ever in the index)
+        self.deep = "/".join(["d%03d" % i + "x" * 200 for i in range(20)])
+        blob = scratch.git("hash-object", "-w", "--stdin", stdin="deep\n").strip()
+        scratch.git(
+            "update-index", "--add", "--cacheinfo", "100644,%s,%s" % (blob, self.deep)
+        )
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def index_version(self, version):
+        self.scratch.git("update-index", "--index-version", str(version))
+        with open(os.path.join(self.scratch.path, ".git", "index"), "rb") as f:
+            self.assertEqual(f.read(8)[4:], bytes([0, 0, 0, version]))
+
+    def test_v2(self):
+        self.index_version(2)
+        self.assertGreater(len(self.deep), worktree.NAME_MASK)
+        self.assertEqual(our_entries(self.scratch), git_entries(self.scratch))
+
+    def test_v4(self):
+        self.index_version(4)
+        self.assertEqual(our_entries(self.scratch), git_entries(self.scratch))
+
+    def test_extended_flags(self):
+        # sorts first, and 8 bytes long so its padding shows the extra flags word
+        self.scratch.write("ABOUT.md", "intended\n")
+        self.scratch.git("add", "--intent-to-add", "ABOUT.md")
+        self.scratch.git("update-index", "--skip-worktree", "README")
+        entries = {entry[0]: entry for entry in our_entries(self.scratch)}
+        self.assertEqual(list(entries.values()), git_entries(self.scratch))
+        self.assertTrue(entries["ABOUT.md"][6] & worktree.EXTENDED)
+        self.assertEqual(entries["ABOUT.md"][7], worktree.INTENT_TO_ADD)
+        self.assertEqual(entries["README"][7], worktree.SKIP_WORKTREE)
+        self.assertEqual(entries["run.sh"][7], 0)
+
+    def test_extended_flags_v4(self):
+        self.scratch.git("update-index", "--skip-worktree", "src/tdver/cli.py")
+        self.index_version(4)
+        self.assertEqual(our_entries(self.scratch), git_entries(self.scratch))
+
+
+class Dirty(unittest.TestCase):
+    """dirty() agrees with `git status` on tracked files."""
+
+    def setUp(self):
+        self.scratch = Scratch()
+        self.scratch.write("a.txt", "a\n")
+        self.scratch.write("tests/t.txt", "t\n")
+        self.scratch.commit("initial")
+        self.repo = pygit2.Repository(self.scratch.path)
+
+    def tearDown(self):
+        self.scratch.remove()
+
+    def assertDirty(self, expected):
+        status = self.scratch.git("status", "--porcelain", "--untracked-files=no")
+        self.assertEqual(bool(status), expected)
+        self.assertEqual(worktree.dirty(self.repo), expected)
+
+    def test_clean(self):
+        self.assertDirty(False)
+
+    def test_modified(self):
+        self.scratch.write("tests/t.txt", "changed\n")
+        self.assertDirty(True)
+
+    def test_untracked(self):
+        self.scratch.write("new.txt", "new\n")
+        self.assertDirty(False)
+
+    def test_intent_to_add(self):
+        self.scratch.write("new.txt", "new\n")
+        self.scratch.git("add", "--intent-to-add", "new.txt")
+        self.assertDirty(True)
+
+    def test_skip_worktree(self):
+        self.scratch.git("update-index", "--skip-worktree", "a.txt")
+        self.scratch.write("a.txt", "hidden\n")
+        self.assertDirty(False)
+
+    def test_bare_filemode_key(self):
+        with open(os.path.join(self.scratch.path, ".git", "config"), "a") as f:
+            f.write("[core]\n\tfilemode\n")
+        self.assertDirty(False)
+        os.chmod(os.path.join(self.scratch.path, "a.txt"), 0o755)
+        self.assertDirty(True)
+
+
+if __name__ == "__main__":
+    unittest.main()
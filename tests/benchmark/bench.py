@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Time tdver's commands and phases against synthetic repositories.
+
+    python tests/benchmark/bench.py --tags 100000 --commits 50 --out new.json
+    python tests/benchmark/bench.py --compare old.json new.json
+
+Each scenario is built once in a temporary directory; every timed run
+gets a fresh TDVer and, for release, a fresh copy of the repository.
+Results are written as JSON so runs on different commits can be diffed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from io import StringIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import pygit2  # noqa: E402 pylint: disable=wrong-import-position
+import tdver  # noqa: E402 pylint: disable=wrong-import-position
+from synth import build_repo  # noqa: E402 pylint: disable=wrong-import-position
+
+
+@contextmanager
+def cwd(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def fresh(config=None):
+    """A TDVer that hasn't touched the repository yet."""
+    return tdver.TDVer(config)
+
+
+def run_command(argv):
+    """Run the CLI in-process; returns the exit status."""
+    try:
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            tdver.main(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    return 0
+
+
+def drop_cache():
+    shutil.rmtree(os.path.join(".git", "tdver"), ignore_errors=True)
+
+
+def drop_results():
+    try:
+        os.unlink(os.path.join(".git", "tdver", "results.idx"))
+    except FileNotFoundError:
+        pass
+
+
+PHASES = {
+    "find_versions:cold": (drop_cache, lambda t: t.find_versions()),
+    "find_versions:warm": (None, lambda t: t.find_versions()),
+    "find_version": (None, lambda t: t.find_version()),
+    "find_changes": (None, lambda t: t.find_changes()),
+    "dirty": (None, lambda t: t.repo.dirty()),
+    "needs_increment:cold": (drop_results, lambda t: t.needs_increment()),
+    "needs_increment:memo": (None, lambda t: t.needs_increment()),
+}
+COMMANDS = ("check", "support", "release", "audit")
+
+
+def timed(fn, setup=None, repeat=5):
+    samples = []
+    error = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:  # pylint: disable=broad-except
+            error = "%s: %s" % (type(e).__name__, e)
+        samples.append(time.perf_counter() - start)
+    result = {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+        "runs": len(samples),
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def bench_scenario(shape, repeat, workdir):
+    path = os.path.join(workdir, "repo")
+    start = time.perf_counter()
+    build_repo(path, dirty=shape.pop("dirty", False), **shape)
+    build_time = time.perf_counter() - start
+
+    results = {"build": build_time, "phases": {}, "commands": {}}
+    with cwd(path):
+        for name, (setup, phase) in PHASES.items():
+            results["phases"][name] = timed(
+                lambda phase=phase: phase(fresh()), setup=setup, repeat=repeat
+            )
+        for command in COMMANDS:
+            if command == "release":
+                # release commits and tags; always start from the pristine repo
+                def once():
+                    scratch = os.path.join(workdir, "release")
+                    shutil.rmtree(scratch, ignore_errors=True)
+                    shutil.copytree(path, scratch, symlinks=True)
+                    with cwd(scratch):
+                        return run_command([command])
+
+                results["commands"][command] = timed(once, repeat=repeat)
+            else:
+                results["commands"][command] = timed(
+                    lambda command=command: run_command([command]), repeat=repeat
+                )
+    return results
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print("%-40s %10s %10s %8s" % ("scenario/measure", "old", "new", "ratio"))
+    for name, scenario in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            continue
+        for kind in ("phases", "commands"):
+            for measure, timing in scenario[kind].items():
+                prior = before[kind].get(measure)
+                if not prior:
+                    continue
+                ratio = timing["median"] / prior["median"] if prior["median"] else 0
+                print(
+                    "%-40s %9.4fs %9.4fs %7.2fx"
+                    % (
+                        "%s/%s" % (name, measure),
+                        prior["median"],
+                        timing["median"],
+                        ratio,
+                    )
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tags", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--commits", type=int, nargs="+", default=[10])
+    parser.add_argument("--test-files", type=int, default=50)
+    parser.add_argument("--bug-files", type=int, default=10)
+    parser.add_argument("--other-files", type=int, nargs="+", default=[500])
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--untracked", type=int, default=0)
+    parser.add_argument("--dirty", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "pygit2": pygit2.__version__,
+        "libgit2": pygit2.LIBGIT2_VERSION,
+        "scenarios": {},
+    }
+    for tags in args.tags:
+        for commits in args.commits:
+            for other_files in args.other_files:
+                shape = {
+                    "tags": tags,
+                    "commits": commits,
+                    "test_files": args.test_files,
+                    "bug_files": args.bug_files,
+                    "other_files": other_files,
+                    "lines": args.lines,
+                    "untracked": args.untracked,
+                }
+                name = "tags=%d,commits=%d,files=%d" % (tags, commits, other_files)
+                print("benchmarking %s" % name, file=sys.stderr)
+                with tempfile.TemporaryDirectory(prefix="tdver-bench-") as workdir:
+                    result = bench_scenario(
+                        dict(shape, dirty=args.dirty), args.repeat, workdir
+                    )
+                result["shape"] = dict(shape, dirty=args.dirty)
+                report["scenarios"][name] = result
+
+    output = json.dumps(report, indent=4, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Measure tdver's startup: what each command imports, and how long that takes.
+
+    python tests/benchmark/importtime.py
+    python tests/benchmark/importtime.py --repeat 10 --out startup.json
+
+Every command runs in a fresh interpreter under `python -X importtime`
+in a small synthetic repository, and those in BARE in a bare clone of it
+too. Exits 1 if a command pulls in a module it shouldn't need (see
+FORBIDDEN), so a stray top-level import fails loudly instead of slowly
+creeping into every invocation.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from synth import build_repo  # noqa: E402 pylint: disable=wrong-import-position
+
+# heavy modules each command has no business importing
+HEAVY = ("pygit2", "yaml", "multiprocessing", "socketserver")
+FORBIDDEN = {
+    "--version": HEAVY,
+    "--help": HEAVY,
+    "check": ("yaml", "multiprocessing", "socketserver"),
+}
+# commands also run in a bare clone, where there's no tdver.json on disk
+BARE = ("--version", "--help")
+# the slowest imports to report per command
+TOP = 8
+
+
+def run(argv, cwd, importtime=False):
+    """Run `tdver argv` in a fresh interpreter; returns (seconds, stderr)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", "import tdver; tdver.main()"] + argv
+    env = dict(os.environ, PYTHONPATH=ROOT, TDVER_NO_DAEMON="1")
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def parse(stderr):
+    """
+    ({module: cumulative microseconds}, total microseconds) from -X
+    importtime output; the total sums only the outermost imports, whose
+    cumulative times already include everything they imported.
+    """
+    found, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            cumulative = int(fields[1])
+        except (IndexError, ValueError):
+            continue  # the header line
+        name = fields[2].rstrip()
+        found[name.strip()] = cumulative
+        if name[1:2] != " ":
+            total += cumulative
+    return found, total
+
+
+def measure(argv, cwd, repeat):
+    wall = [run(argv, cwd)[0] for _ in range(repeat)]
+    modules, total = parse(run(argv, cwd, importtime=True)[1])
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:TOP]
+    loaded = [name for name in FORBIDDEN.get(argv[0], ()) if name in modules]
+    return {
+        "wall": {"median": statistics.median(wall), "min": min(wall)},
+        "imports_us": total,
+        "slowest": dict(top),
+        "forbidden": loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "repo")
+        build_repo(path, tags=10, commits=2, other_files=10, history=20)
+        results = {cmd: measure([cmd], path, args.repeat) for cmd in FORBIDDEN}
+        bare = os.path.join(workdir, "bare.git")
+        subprocess.run(["git", "clone", "-q", "--bare", path, bare], check=True)
+        for cmd in BARE:
+            results[cmd + " (bare)"] = measure([cmd], bare, args.repeat)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    status = 0
+    for cmd, result in results.items():
+        if result["forbidden"]:
+            print(
+                "tdver %s imported %s" % (cmd, ", ".join(result["forbidden"])),
+                file=sys.stderr,
+            )
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Build synthetic tdver repositories of a given shape with pygit2"""
+import os
+import json
+import pygit2
+
+SIGNATURE = pygit2.Signature("Bench Mark", "bench@example.com", 1700000000, 0)
+
+
+def version_names(count):
+    """count ascending A.B.C tag names, 100 patch releases per minor and 100 minors per major."""
+    for i in range(count):
+        yield "%d.%d.%d" % (i // 10000, (i // 100) % 100, i % 100)
+
+
+def write_tree(repo, files):
+    """Write a nested tree for a flat {path: bytes} mapping and return its OID."""
+    nested = {}
+    for path, data in files.items():
+        node = nested
+        *dirs, name = path.split("/")
+        for part in dirs:
+            node = node.setdefault(part, {})
+        node[name] = data
+
+    def build(node):
+        builder = repo.TreeBuilder()
+        for name, value in sorted(node.items()):
+            if isinstance(value, dict):
+                builder.insert(name, build(value), pygit2.GIT_FILEMODE_TREE)
+            else:
+                builder.insert(name, repo.create_blob(value), pygit2.GIT_FILEMODE_BLOB)
+        return builder.write()
+
+    return build(nested)
+
+
+def update_tree(repo, tree, path, data):
+    """Return the OID of tree with the blob at path replaced, rewriting only its ancestors."""
+    head, _, rest = path.partition("/")
+    builder = repo.TreeBuilder(repo[tree]) if tree is not None else repo.TreeBuilder()
+    if rest:
+        entry = builder.get(head)
+        oid = update_tree(repo, entry.id if entry is not None else None, rest, data)
+        builder.insert(head, oid, pygit2.GIT_FILEMODE_TREE)
+    else:
+        builder.insert(head, repo.create_blob(data), pygit2.GIT_FILEMODE_BLOB)
+    return builder.write()
+
+
+def file_body(path, lines, salt=0):
+    return "".join("%s %d %d\n" % (path, salt, n) for n in range(lines)).encode()
+
+
+def build_repo(  # pylint: disable=too-many-arguments,too-many-locals
+    path,
+    tags=100,
+    commits=10,
+    test_files=50,
+    bug_files=10,
+    other_files=500,
+    lines=20,
+    history=1000,
+    untracked=0,
+    dirty=False,
+    checkout=True,
+):
+    """
+    Create a repository at path whose history carries `tags` tdver tags
+    (spread over at most `history` commits, packed like a real clone) then
+    `commits` commits that touch tests/, bugs/ and src/ in rotation.
+
+    The newest tag is annotated and the rest are lightweight, so both
+    kinds get peeled to their commits. With checkout
+    the worktree is populated; `untracked` build artifacts and a `dirty`
+    tracked file can be added on top for the dirty-scan phases.
+    """
+    repo = pygit2.init_repository(path, initial_head="main")
+    files = {
+        "tdver.json": json.dumps({"version": "0.0.0"}).encode(),
+        ".travis.yml": b"script: tdver check\n",
+    }
+    for prefix, count in (("tests", test_files), ("bugs", bug_files), ("src", other_files)):
+        for n in range(count):
+            name = "%s/d%d/f%d" % (prefix, n % 16, n)
+            files[name] = file_body(name, lines)
+
+    names = list(version_names(max(tags, 1)))
+    history = max(1, min(history or len(names), len(names)))
+    tree = write_tree(repo, files)
+    parents = []
+    tagged = []
+    for n in range(history):
+        tree = update_tree(repo, tree, "src/history", b"%d\n" % n)
+        oid = repo.create_commit(None, SIGNATURE, SIGNATURE, "history %d" % n, tree, parents)
+        parents = [oid]
+        tagged.append(oid)
+
+    # every tag but the newest goes straight into packed-refs
+    per_commit = -(-(len(names) - 1) // history) or 1
+    packed = [
+        (str(tagged[min(i // per_commit, history - 1)]), "refs/tags/" + name)
+        for i, name in enumerate(names[:-1])
+    ]
+    with open(os.path.join(repo.path, "packed-refs"), "w") as f:
+        f.write("# pack-refs with: peeled sorted \n")
+        for oid, ref in sorted(packed, key=lambda x: x[1]):
+            f.write("%s %s\n" % (oid, ref))
+    repo.create_tag(
+        names[-1], tagged[-1], pygit2.GIT_OBJECT_COMMIT, SIGNATURE, "Version %s" % names[-1]
+    )
+
+    rotation = ("tests", "bugs", "src")
+    for n in range(commits):
+        prefix = rotation[n % len(rotation)]
+        count = {"tests": test_files, "bugs": bug_files, "src": other_files}[prefix]
+        if count:
+            name = "%s/d%d/f%d" % (prefix, n % 16, n % count)
+        else:
+            name = "%s/new%d" % (prefix, n)
+        tree = update_tree(repo, tree, name, file_body(name, lines, n + 1))
+        parents = [
+            repo.create_commit(None, SIGNATURE, SIGNATURE, "change %d" % n, tree, parents)
+        ]
+
+    repo.references.create("refs/heads/main", parents[0], force=True)
+    repo.set_head("refs/heads/main")
+
+    if checkout:
+        repo.checkout_head(strategy=pygit2.GIT_CHECKOUT_FORCE)
+        for n in range(untracked):
+            artifact = os.path.join(path, "build", "d%d" % (n % 32), "a%d.o" % n)
+            os.makedirs(os.path.dirname(artifact), exist_ok=True)
+            with open(artifact, "wb") as f:
+                f.write(b"\0" * 64)
+        if dirty:
+            with open(os.path.join(path, "src", "history"), "ab") as f:
+                f.write(b"dirty\n")
+    return repo